@@ -1,23 +1,117 @@
+import re
 import nltk
+import time
+import string
+import hashlib
 import logging
+import threading
+import numpy as np
 import pandas as pd
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from functools import partial
+from cache import SentimentCache
+from metrics import recorder
+from concurrent.futures import ProcessPoolExecutor
+from nltk.sentiment.vader import SentimentIntensityAnalyzer, SentiText
 
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
 
+class BatchSentiText(SentiText):
+    """
+    SentiText that strips leading/trailing punctuation with one regex match
+    per token instead of building the PUNC_LIST x words product per text.
+    """
+    PUNCTUATION = re.escape(string.punctuation)
+    SPLIT_PUNCTUATION = re.compile(
+        f"([^{PUNCTUATION}]+)([{PUNCTUATION}]+)|([{PUNCTUATION}]+)([^{PUNCTUATION}]+)")
+
+    def _words_and_emoticons(self):
+        no_punc_text = self.REGEX_REMOVE_PUNCTUATION.sub("", self.text)
+        words_only = {w for w in no_punc_text.split() if len(w) > 1}
+        punc_list = set(self.PUNC_LIST)
+        wes = [we for we in self.text.split() if len(we) > 1]
+        for i, we in enumerate(wes):
+            match = self.SPLIT_PUNCTUATION.fullmatch(we)
+            if match is None:
+                continue
+            word, punc_after, punc_before, word_after_punc = match.groups()
+            if word is None:
+                punc, word = punc_before, word_after_punc
+            else:
+                punc = punc_after
+            if punc in punc_list and word in words_only:
+                wes[i] = word
+        return wes
+
+
+class ValenceScorer(SentimentIntensityAnalyzer):
+    """VADER analyzer that returns the raw token valences of a text."""
+
+    def __init__(self, sid):
+        # Share the lexicon and constants already loaded by `sid`.
+        self.__dict__.update(sid.__dict__)
+
+    def valences(self, text):
+        """Returns the valences polarity_scores would aggregate for a text."""
+        sentitext = BatchSentiText(
+            text, self.constants.PUNC_LIST, self.constants.REGEX_REMOVE_PUNCTUATION)
+        sentiments = []
+        words_and_emoticons = sentitext.words_and_emoticons
+        for item in words_and_emoticons:
+            valence = 0
+            i = words_and_emoticons.index(item)
+            if (i < len(words_and_emoticons) - 1 and item.lower() == "kind"
+                    and words_and_emoticons[i + 1].lower() == "of") \
+                    or item.lower() in self.constants.BOOSTER_DICT:
+                sentiments.append(valence)
+                continue
+            sentiments = self.sentiment_valence(
+                valence, sentitext, item, i, sentiments)
+        return self._but_check(words_and_emoticons, sentiments)
+
+
+# VADER analyzer and cache versions shared by every SentimentAnalyzer of
+# the process; loaded on first use.
+vader = None
+vader_versions = {}
+vader_lock = threading.Lock()
+
+
+def get_vader():
+    """Loads the VADER lexicon once per process."""
+    global vader
+    if vader is None:
+        with vader_lock:
+            if vader is None:
+                sid = SentimentIntensityAnalyzer()
+                vader = (sid, ValenceScorer(sid))
+    return vader
+
+
 class SentimentAnalyzer:
+    SENTIMENTS = ['Negative', 'Neutral', 'Positive']
     NEGATIVE_THRESHOLD = -0.05
     POSITIVE_THRESHOLD = 0.05
+    # Alpha used by VADER to normalize the summed valence into [-1, 1].
+    NORMALIZE_ALPHA = 15
+    # Number of unique texts aggregated per NumPy block in batch mode.
+    BATCH_SIZE = 10000
+    # Rows per chunk handed to a worker process in parallel mode.
+    CHUNK_SIZE = 10000
+    # Below this many rows the process pool costs more than it saves.
+    MIN_PARALLEL_ROWS = 20000
 
-    def __init__(self, df):
+    def __init__(self, df, cache_path=None):
         if not isinstance(df, pd.DataFrame):
             raise ValueError("df should be a pandas DataFrame")
 
         self.df = df
-        self.sid = SentimentIntensityAnalyzer()
+        self.chunk_timings = []
+        self.cache = None
+        if cache_path is not None:
+            self.cache = SentimentCache(cache_path, self.cache_version())
 
         # try:
         #     nltk.download('vader_lexicon')
@@ -26,6 +120,29 @@ class SentimentAnalyzer:
         #         f"An error occurred while downloading the 'vader_lexicon'.")
         #     raise e
 
+    @property
+    def sid(self):
+        return get_vader()[0]
+
+    @property
+    def valence_scorer(self):
+        return get_vader()[1]
+
+    def cache_version(self):
+        """
+        Returns a key identifying the lexicon, thresholds and nltk release,
+        so cached scores are dropped whenever any of them change.
+        """
+        key = (self.NEGATIVE_THRESHOLD, self.POSITIVE_THRESHOLD)
+        if key not in vader_versions:
+            digest = hashlib.sha256(
+                f"{nltk.__version__}|{self.NEGATIVE_THRESHOLD}|"
+                f"{self.POSITIVE_THRESHOLD}".encode('utf-8'))
+            for word, measure in sorted(self.sid.lexicon.items()):
+                digest.update(f"{word}\t{measure}\n".encode('utf-8'))
+            vader_versions[key] = digest.hexdigest()
+        return vader_versions[key]
+
     def get_sentiment(self, score):
         """Determines sentiment category based on the score."""
         if score < self.NEGATIVE_THRESHOLD:
@@ -35,20 +152,198 @@ class SentimentAnalyzer:
         else:
             return 'Neutral'
 
-    def analyze(self):
-        """Performs sentiment analysis on the data."""
+    def get_sentiments(self, scores, categorical=False):
+        """
+        Determines sentiment categories for an array of scores, as a
+        Categorical built from codes when `categorical` is set.
+        """
+        scores = np.asarray(scores)
+        conditions = [scores < self.NEGATIVE_THRESHOLD, scores > self.POSITIVE_THRESHOLD]
+        if categorical:
+            codes = np.select(conditions, [0, 2], default=1).astype(np.int8)
+            return pd.Categorical.from_codes(codes, self.SENTIMENTS)
+        return np.select(conditions, ['Negative', 'Positive'], default='Neutral')
+
+    def score_valences(self, valences, texts):
+        """
+        Aggregates raw VADER valences into neg/neu/pos/compound arrays.
+        Mirrors SentimentIntensityAnalyzer.score_valence operation by operation.
+        """
+        lengths = np.fromiter(map(len, valences), dtype=np.int64,
+                              count=len(valences))
+        width = max(int(lengths.max(initial=0)), 1)
+        mask = np.arange(width) < lengths[:, None]
+        matrix = np.zeros((len(valences), width))
+        matrix[mask] = np.fromiter(
+            (float(v) for sentiments in valences for v in sentiments),
+            dtype=np.float64, count=int(lengths.sum()))
+
+        # VADER sums with the builtin sum(); keep it so results stay bit-identical.
+        sum_s = np.fromiter((float(sum(sentiments)) for sentiments in valences),
+                            dtype=np.float64, count=len(valences))
+        # cumsum accumulates left to right like the `+=` loop in VADER.
+        pos_sum = np.cumsum(np.where(matrix > 0, matrix + 1, 0.0), axis=1)[:, -1]
+        neg_sum = np.cumsum(np.where(matrix < 0, matrix - 1, 0.0), axis=1)[:, -1]
+        neu_count = ((matrix == 0) & mask).sum(axis=1)
+
+        ep_count = np.minimum(texts.str.count('!').to_numpy(dtype=np.int64), 4)
+        qm_count = texts.str.count(r'\?').to_numpy(dtype=np.int64)
+        amplifier = ep_count * 0.292 + np.where(
+            qm_count > 1, np.where(qm_count <= 3, qm_count * 0.18, 0.96), 0)
+
+        sum_s = np.where(sum_s > 0, sum_s + amplifier,
+                         np.where(sum_s < 0, sum_s - amplifier, sum_s))
+        compound = sum_s / np.sqrt(sum_s * sum_s + self.NORMALIZE_ALPHA)
+
+        abs_neg = np.fabs(neg_sum)
+        pos_sum, neg_sum = (
+            np.where(pos_sum > abs_neg, pos_sum + amplifier, pos_sum),
+            np.where(pos_sum < abs_neg, neg_sum - amplifier, neg_sum))
+        total = pos_sum + np.fabs(neg_sum) + neu_count
+        has_tokens = lengths > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pos = np.where(has_tokens, np.fabs(pos_sum / total), 0.0)
+            neg = np.where(has_tokens, np.fabs(neg_sum / total), 0.0)
+            neu = np.where(has_tokens, np.fabs(neu_count / total), 0.0)
+        compound = np.where(has_tokens, compound, 0.0)
+
+        # np.round scales by 10**n first and can disagree with round() in
+        # the last digit, so round with the builtin like VADER does.
+        return {
+            'neg': [round(x, 3) for x in neg.tolist()],
+            'neu': [round(x, 3) for x in neu.tolist()],
+            'pos': [round(x, 3) for x in pos.tolist()],
+            'compound': [round(x, 4) for x in compound.tolist()],
+        }
+
+    def score_unique(self, texts):
+        """
+        Scores a Series of distinct texts in blocks of BATCH_SIZE.
+        Each text is tokenized and looked up in the lexicon once and the
+        scores are aggregated as NumPy columns.
+        """
+        columns = {'neg': [], 'neu': [], 'pos': [], 'compound': []}
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            block = texts.iloc[start:start + self.BATCH_SIZE]
+            valences = [self.valence_scorer.valences(text)
+                        for text in block]
+            # Keep each block as an array rather than lists of float objects.
+            for name, values in self.score_valences(valences, block).items():
+                columns[name].append(np.array(values, dtype=np.float64))
+        return pd.DataFrame(
+            {name: np.concatenate(blocks) if blocks else np.empty(0)
+             for name, blocks in columns.items()},
+            index=texts.index)
+
+    def score_pool(self, texts, workers, chunk_size=None):
+        """
+        Scores a Series of distinct texts in chunks across a pool of worker
+        processes. Each worker loads the VADER lexicon once; results are
+        stitched back in the original order. Small inputs are scored serially.
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        if workers <= 1 or len(texts) < max(self.MIN_PARALLEL_ROWS, chunk_size):
+            logging.info(
+                f"Scoring {len(texts)} texts serially instead of with {workers} workers.")
+            return self.score_unique(texts)
+
+        chunks = [texts.iloc[start:start + chunk_size]
+                  for start in range(0, len(texts), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=init_worker) as executor:
+            results = list(executor.map(score_chunk, chunks))
+
+        self.chunk_timings = []
+        for number, (scores, seconds) in enumerate(results):
+            self.chunk_timings.append({'chunk': number,
+                                       'rows': len(scores),
+                                       'seconds': seconds})
+            logging.info(
+                f"Chunk {number}: scored {len(scores)} texts in {seconds:.2f}s")
+        return pd.concat([scores for scores, _ in results])
+
+    def score_distinct(self, texts, score_func, columns=None):
+        """
+        Scores each distinct text once with `score_func`, going through the
+        cache when one is configured, and expands the scores back to rows.
+        Only `columns` are expanded when given.
+        """
+        codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+        uniques = pd.Series(uniques, dtype=object)
+        if self.cache is not None:
+            scores = self.cache.fetch(uniques, score_func)
+        else:
+            scores = score_func(uniques)
+        if columns is not None:
+            scores = scores[columns]
+        return pd.DataFrame(scores.to_numpy()[codes],
+                            columns=scores.columns, index=texts.index)
+
+    def score_batch(self, texts, columns=None):
+        """
+        Scores a Series of texts in bulk. Returns a DataFrame with the same
+        neg/neu/pos/compound values as polarity_scores.
+        """
+        return self.score_distinct(texts, self.score_unique, columns)
+
+    def score_parallel(self, texts, workers, chunk_size=None, columns=None):
+        """Scores a Series of texts in bulk across `workers` processes."""
+        return self.score_distinct(
+            texts, partial(self.score_pool, workers=workers, chunk_size=chunk_size),
+            columns)
+
+    def analyze(self, batch=False, workers=None, chunk_size=None, categorical=False):
+        """
+        Performs sentiment analysis on the data.
+        Passing `workers` scores the text in parallel chunks, which implies
+        batch mode. `categorical` stores the batch sentiments as a category.
+        """
         if self.df is None:
             logging.error("No DataFrame provided to analyze.")
             return None
 
         try:
-            self.df['scores'] = self.df['text'].apply(
-                lambda text: self.sid.polarity_scores(text))
-            self.df['compound'] = self.df['scores'].apply(
-                lambda score_dict: score_dict['compound'])
-            self.df['sentiment'] = self.df['compound'].apply(
-                self.get_sentiment)
-            return self.df
+            with recorder.stage('analyze', rows=len(self.df)):
+                if workers is not None:
+                    scores = self.score_parallel(
+                        self.df['text'], workers, chunk_size, ['compound'])
+                    self.df['compound'] = scores['compound']
+                    self.df['sentiment'] = self.get_sentiments(
+                        scores['compound'], categorical)
+                    return self.df
+
+                if batch:
+                    scores = self.score_batch(self.df['text'], ['compound'])
+                    self.df['compound'] = scores['compound']
+                    self.df['sentiment'] = self.get_sentiments(
+                        scores['compound'], categorical)
+                    return self.df
+
+                self.df['scores'] = self.df['text'].apply(
+                    lambda text: self.sid.polarity_scores(text))
+                self.df['compound'] = self.df['scores'].apply(
+                    lambda score_dict: score_dict['compound'])
+                self.df['sentiment'] = self.df['compound'].apply(
+                    self.get_sentiment)
+                return self.df
         except Exception as e:
             logging.error(f"An error occurred while analyzing sentiment.")
             raise e
+
+
+# Analyzer owned by each worker process of SentimentAnalyzer.score_parallel.
+worker_analyzer = None
+
+
+def init_worker():
+    """Loads the VADER lexicon once per worker process."""
+    global worker_analyzer
+    get_vader()
+    worker_analyzer = SentimentAnalyzer(pd.DataFrame())
+
+
+def score_chunk(texts):
+    """Scores one chunk of texts in a worker process and times it."""
+    start = time.perf_counter()
+    scores = worker_analyzer.score_unique(texts)
+    return scores, time.perf_counter() - start
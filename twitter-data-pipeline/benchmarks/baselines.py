@@ -0,0 +1,37 @@
+import os
+import json
+import platform
+
+
+def load_baselines(path):
+    """Returns the stored baseline results, or an empty dict."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('results', {})
+
+
+def write_baselines(path, results):
+    """Merges `results` into the stored baselines, tagged with this machine."""
+    baselines = load_baselines(path)
+    baselines.update(results)
+    with open(path, 'w') as f:
+        json.dump({'machine': platform.platform(),
+                   'python': platform.python_version(),
+                   'results': baselines}, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Baselines written to {path}.")
+
+
+def check_baselines(path, results, update_baseline, compare):
+    """
+    Stores `results` as the new baselines, or prints the regressions that
+    `compare(results, baselines)` finds. Returns the exit status.
+    """
+    if update_baseline:
+        write_baselines(path, results)
+        return 0
+    regressions = compare(results, load_baselines(path))
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
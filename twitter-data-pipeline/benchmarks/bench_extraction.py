@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import TwitterScraper
+from html_fixture import write_fixture, serve
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run(articles, rounds):
+    """Compares per-element WebDriver extraction with one in-browser script."""
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixture(directory, articles)
+        server, url = serve(directory)
+        scraper = TwitterScraper('fixture', None, headless=True)
+        try:
+            scraper.driver.get(f"{url}/search.html")
+            expected, _ = timed(scraper.scrap_tweets)
+            actual, _ = timed(scraper.scrap_tweets_batch)
+            assert actual == expected, "Batch extraction returned different fields."
+
+            element_seconds = sum(timed(scraper.scrap_tweets)[1] for _ in range(rounds))
+            batch_seconds = sum(timed(scraper.scrap_tweets_batch)[1] for _ in range(rounds))
+            print(f"articles={articles} rounds={rounds} "
+                  f"find_element={element_seconds / rounds:.3f}s/round "
+                  f"execute_script={batch_seconds / rounds:.3f}s/round "
+                  f"speedup={element_seconds / batch_seconds:.1f}x")
+        finally:
+            scraper.driver.quit()
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tweet DOM extraction round-trip cost')
+    parser.add_argument('--articles', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    run(args.articles, args.rounds)
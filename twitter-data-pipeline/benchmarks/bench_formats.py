@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script import AwsControl, DataProcessor
+from analyzer import SentimentAnalyzer
+from synthetic import make_tweets
+from s3_stub import start_s3_server
+
+BUCKET = 'bench-formats'
+VARIANTS = [('csv', None), ('parquet', 'snappy'), ('parquet', 'zstd')]
+
+
+def make_frames(rows):
+    """Builds a raw frame and the analyzed frame derived from it."""
+    raw_df = make_tweets(rows)
+    processed_df = SentimentAnalyzer(raw_df.drop_duplicates().copy()).analyze(batch=True)
+    return {'raw': raw_df, 'analyzed': processed_df.drop(columns='text')}
+
+
+def run(rows):
+    server, endpoint_url = start_s3_server()
+    try:
+        frames = make_frames(rows)
+        for kind, df in frames.items():
+            typed_df = DataProcessor(df.copy()).apply_schema().df
+            for file_format, compression in VARIANTS:
+                aws = AwsControl('testing', 'testing', 'us-east-1', endpoint_url,
+                                 compression=compression)
+                s3 = aws.get_client()
+                s3.create_bucket(Bucket=BUCKET)
+                file_name = f"{kind}.{file_format}"
+
+                start = time.perf_counter()
+                aws.upload_to_s3(typed_df if file_format == 'parquet' else df,
+                                file_name, BUCKET)
+                upload_seconds = time.perf_counter() - start
+                size = s3.head_object(Bucket=BUCKET, Key=file_name)['ContentLength']
+                start = time.perf_counter()
+                aws.download_from_s3(BUCKET, file_name)
+                download_seconds = time.perf_counter() - start
+
+                label = file_format if compression is None else f"{file_format}/{compression}"
+                print(f"{kind:9} {label:16} size={size / 2 ** 20:8.2f}MiB "
+                      f"upload={upload_seconds:6.2f}s download={download_seconds:6.2f}s")
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CSV vs Parquet object size and transfer time')
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+    run(args.rows)
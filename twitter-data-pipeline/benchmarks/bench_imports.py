@@ -0,0 +1,122 @@
+import os
+import sys
+import argparse
+import subprocess
+from functools import partial
+from baselines import check_baselines
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_baselines.json')
+# Code each entry point runs before its first real work, and the packages
+# it must not pull in. main itself imports pandas and boto3; only selenium
+# and nltk are deferred to the stages that use them.
+ENTRY_POINTS = {
+    'dag_parse': ("import dag", ['main', 'pandas', 'selenium', 'nltk', 'boto3']),
+    'plan_queries': ("import main\nmain.TwitterETL().plan_queries()", ['selenium', 'nltk']),
+    'extraction': ("import main\nimport scraper", ['nltk']),
+    'transformation': ("import main\nimport analyzer\nanalyzer.get_vader()", ['selenium']),
+    'lambda': ("import importlib\nimportlib.import_module('lambda')", ['pandas', 'selenium', 'nltk']),
+}
+# Dummy settings lambda.py reads at import.
+LAMBDA_ENV = {'DB_NAME': 'dev', 'DB_USER': 'user', 'DB_PASSWORD': 'password',
+              'DB_HOST': 'localhost', 'DB_PORT': '5439',
+              'Access_key': 'testing', 'Secret_access_key': 'testing'}
+
+
+def parse_importtime(stderr, preloaded):
+    """
+    Returns the import time in milliseconds from `python -X importtime`
+    output, leaving out interpreter startup, and the cumulative time of
+    every package imported at any depth.
+    """
+    total = 0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        module = name.strip()
+        if module in preloaded or '.' in module:
+            continue
+        if not name[1:].startswith(' '):
+            total += int(cumulative_us)
+        packages[module] = max(packages.get(module, 0), int(cumulative_us) / 1000)
+    return total / 1000, packages
+
+
+def measure(name, repeat):
+    """Runs an entry point in fresh interpreters and keeps the fastest run."""
+    code, forbidden = ENTRY_POINTS[name]
+    child = (f"import sys, time\npreloaded = ' '.join(sys.modules)\n"
+             f"start = time.perf_counter()\n{code}\n"
+             f"print(time.perf_counter() - start)\nprint(preloaded)\n"
+             f"print(' '.join(sys.modules))")
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', child],
+                                cwd=PIPELINE_DIR, env={**os.environ, **LAMBDA_ENV},
+                                capture_output=True, text=True)
+        if output.returncode != 0:
+            return {'error': output.stderr.strip().splitlines()[-1]}
+        seconds, preloaded, modules = output.stdout.strip().splitlines()[-3:]
+        import_ms, packages = parse_importtime(output.stderr, set(preloaded.split()))
+        run = {'startup_ms': float(seconds) * 1000, 'import_ms': import_ms,
+               'top_imports': dict(sorted(packages.items(), key=lambda item: -item[1])[:6]),
+               'forbidden': [package for package in forbidden
+                             if package in modules.split()]}
+        if best is None or run['startup_ms'] < best['startup_ms']:
+            best = run
+    return best
+
+
+def compare(results, baselines, threshold):
+    """Returns the forbidden imports and the startup regressions of `results`."""
+    regressions = []
+    for name, result in results.items():
+        if result['forbidden']:
+            regressions.append(f"{name} imports {', '.join(result['forbidden'])}")
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        slowest = baseline['startup_ms'] * (1 + threshold)
+        if result['startup_ms'] > slowest:
+            regressions.append(
+                f"{name}: startup {result['startup_ms']:.0f}ms is above "
+                f"{slowest:.0f}ms (baseline {baseline['startup_ms']:.0f}ms)")
+    return regressions
+
+
+def main(entry_points, repeat, threshold, update_baseline):
+    results = {}
+    for name in entry_points:
+        results[name] = result = measure(name, repeat)
+        if 'error' in result:
+            print(f"{name:16} failed: {result['error']}")
+            continue
+        print(f"{name:16} startup={result['startup_ms']:8.1f}ms "
+              f"imports={result['import_ms']:8.1f}ms")
+        for module, cumulative_ms in result['top_imports'].items():
+            print(f"{'':16}   {module:28} {cumulative_ms:8.1f}ms")
+    failed = {name: result['error'] for name, result in results.items() if 'error' in result}
+    results = {name: result for name, result in results.items() if 'error' not in result}
+
+    status = check_baselines(BASELINE_PATH, results, update_baseline,
+                             partial(compare, threshold=threshold))
+    # An entry point that no longer imports is the worst regression of all.
+    for name, error in failed.items():
+        print(f"REGRESSION {name} fails to import: {error}")
+    return 1 if failed else status
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Cold-start import time of the Airflow tasks and the Lambda')
+    parser.add_argument('--entry-points', nargs='+', choices=list(ENTRY_POINTS),
+                        default=list(ENTRY_POINTS))
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='fresh interpreters per entry point; the fastest one is kept')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed fractional growth in startup time')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+    sys.exit(main(args.entry_points, args.repeat, args.threshold, args.update_baseline))
@@ -0,0 +1,64 @@
+import os
+import sys
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_tweets
+from child import peak_rss_mib, run_child, child_main
+
+
+def run_processing(corpus_path, lean, output_path):
+    """Processes the corpus like TwitterETL.process_data and returns peak RSS in MiB."""
+    from main import TwitterETL
+    raw_df = pd.read_csv(corpus_path)
+    loaded_rss = peak_rss_mib()
+    etl = TwitterETL(lean_processing=lean)
+    processed_df = etl.process_data(raw_df)
+    peak_rss = peak_rss_mib()
+    frame_mib = processed_df.memory_usage(deep=True).sum() / 2 ** 20
+    processed_df.to_csv(output_path, index=False)
+    return {'loaded_rss_mib': loaded_rss, 'peak_rss_mib': peak_rss, 'frame_mib': frame_mib}
+
+
+def child(corpus_path, lean, output_path):
+    return run_processing(corpus_path, lean == '1', output_path)
+
+
+def measure(corpus_path, lean, output_path):
+    """Processes the corpus in a fresh process so peak RSS is its own."""
+    return run_child(__file__, corpus_path, int(lean), output_path)
+
+
+def run(rows, duplicate_ratio):
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_path = os.path.join(directory, 'raw.csv')
+        make_tweets(rows, duplicate_ratio).to_csv(corpus_path, index=False)
+        before = measure(corpus_path, False, os.path.join(directory, 'default.csv'))
+        after = measure(corpus_path, True, os.path.join(directory, 'lean.csv'))
+        default_df = pd.read_csv(os.path.join(directory, 'default.csv'))
+        lean_df = pd.read_csv(os.path.join(directory, 'lean.csv'))
+
+    # Lean mode writes parsed timestamps; every other column must match.
+    assert list(default_df.columns) == list(lean_df.columns), "Column order changed."
+    pd.testing.assert_series_equal(pd.to_datetime(default_df['created_at'], utc=True),
+                                   pd.to_datetime(lean_df['created_at'], utc=True))
+    pd.testing.assert_frame_equal(default_df.drop(columns='created_at'),
+                                  lean_df.drop(columns='created_at'))
+    print(f"rows={rows} "
+          f"default: frame={before['frame_mib']:.0f}MiB peak_rss={before['peak_rss_mib']:.0f}MiB "
+          f"(+{before['peak_rss_mib'] - before['loaded_rss_mib']:.0f}MiB over load) | "
+          f"lean: frame={after['frame_mib']:.0f}MiB peak_rss={after['peak_rss_mib']:.0f}MiB "
+          f"(+{after['peak_rss_mib'] - after['loaded_rss_mib']:.0f}MiB over load)")
+
+
+if __name__ == '__main__':
+    child_main(child)
+
+    parser = argparse.ArgumentParser(description='Peak memory of default vs lean processing')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3)
+    args = parser.parse_args()
+    run(args.rows, args.duplicate_ratio)
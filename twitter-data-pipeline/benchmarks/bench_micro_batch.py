@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper
+from main import TwitterETL
+from script import AwsControl
+from s3_stub import start_s3_server
+from synthetic import make_tweets
+
+RAW_BUCKET = 'bench-raw'
+PROCESSED_BUCKET = 'bench-processed'
+
+
+class ReplayScraper:
+    """
+    Stands in for TwitterScraper by replaying a corpus as scroll rounds of
+    `round_rows` tweets, each taking `round_seconds` like a page load.
+    """
+    corpus = None
+    round_rows = 100
+    round_seconds = 0.05
+
+    def __init__(self, query, auth_token, driver_pool=None, on_batch=None, **options):
+        self.on_batch = on_batch
+        self.timings = {}
+
+    def login_and_search(self):
+        pass
+
+    def scroll_and_scrap(self):
+        tweets_list = []
+        for start in range(0, len(self.corpus), self.round_rows):
+            time.sleep(self.round_seconds)
+            tweets = self.corpus.iloc[start:start + self.round_rows].to_dict('records')
+            if self.on_batch is None:
+                tweets_list += tweets
+            else:
+                self.on_batch(tweets)
+        return pd.DataFrame(tweets_list)
+
+
+class TimedETL(TwitterETL):
+    """Records when the first processed file reaches S3."""
+    first_upload = None
+
+    def upload_processed_data(self, processed_df, raw_file_name=None):
+        processed_file_name = super().upload_processed_data(processed_df, raw_file_name)
+        if self.first_upload is None:
+            self.first_upload = time.perf_counter()
+        return processed_file_name
+
+
+def create_etl(endpoint_url, **options):
+    etl = TimedETL(**options)
+    etl.aws = AwsControl('testing', 'testing', 'us-east-1', endpoint_url)
+    etl.raw_data_bucket_name = RAW_BUCKET
+    etl.processed_data_bucket_name = PROCESSED_BUCKET
+    return etl
+
+
+def count_rows(etl, file_names):
+    return sum(len(etl.aws.download_from_s3(PROCESSED_BUCKET, name)) for name in file_names)
+
+
+def run(rows, round_rows, round_seconds, batch_rows, queue_size):
+    ReplayScraper.corpus = make_tweets(rows, 0.3)
+    ReplayScraper.round_rows = round_rows
+    ReplayScraper.round_seconds = round_seconds
+    scraper.TwitterScraper = ReplayScraper
+    server, endpoint_url = start_s3_server()
+    try:
+        client = AwsControl('testing', 'testing', 'us-east-1', endpoint_url).get_client()
+        client.create_bucket(Bucket=RAW_BUCKET)
+        client.create_bucket(Bucket=PROCESSED_BUCKET)
+
+        # Scrape everything, upload the raw file, download it and analyze it.
+        etl = create_etl(endpoint_url)
+        start = time.perf_counter()
+        raw_file_name = etl.extract_query(etl.query)
+        processed_file_name = etl.twitter_data_transformation(raw_file_name)
+        batch_seconds = time.perf_counter() - start
+        batch_rows_out = count_rows(etl, [processed_file_name])
+
+        etl = create_etl(endpoint_url, micro_batch_rows=batch_rows,
+                         micro_batch_queue_size=queue_size)
+        start = time.perf_counter()
+        file_names = etl.micro_batch_extraction()
+        micro_seconds = time.perf_counter() - start
+        micro_rows_out = count_rows(etl, file_names)
+    finally:
+        server.stop()
+
+    assert batch_rows_out == micro_rows_out, "Micro-batches lost or duplicated rows."
+    print(f"rows={rows} batch: first_row={batch_seconds:.2f}s total={batch_seconds:.2f}s")
+    print(f"rows={rows} micro-batch: first_row={etl.first_upload - start:.2f}s "
+          f"total={micro_seconds:.2f}s files={len(file_names)} "
+          f"scraper_waited={etl.micro_batch_wait:.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-batch streaming against the batch path')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--round-rows', type=int, default=500)
+    parser.add_argument('--round-seconds', type=float, default=0.05)
+    parser.add_argument('--batch-rows', type=int, default=5000)
+    parser.add_argument('--queue-size', type=int, default=8)
+    args = parser.parse_args()
+    run(args.rows, args.round_rows, args.round_seconds, args.batch_rows, args.queue_size)
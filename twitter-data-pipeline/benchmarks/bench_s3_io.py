@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script import AwsControl, DataProcessor
+from s3_stub import start_s3_process
+from synthetic import make_tweets
+
+BUCKET = 'bench-s3-io'
+
+
+def add_network(aws, latency, bandwidth):
+    """
+    Delays every request of the shared client like a round trip to S3, and
+    by its payload size at `bandwidth` bytes/s, like the per-connection
+    throughput limit of S3 that local emulators do not have.
+    """
+    def before_send(request, **kwargs):
+        size = int(request.headers.get('Content-Length', 0))
+        time.sleep(latency + (size / bandwidth if bandwidth else 0))
+
+    def after_get(parsed, **kwargs):
+        if bandwidth:
+            time.sleep(parsed.get('ContentLength', 0) / bandwidth)
+
+    events = aws.get_client().meta.events
+    events.register('before-send.s3', before_send)
+    events.register('after-call.s3.GetObject', after_get)
+
+
+def transfer(aws, df, file_name, repeat):
+    """Returns the fastest upload and download of `df` in seconds."""
+    uploads, downloads = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        assert aws.upload_to_s3(df, file_name, BUCKET), "Upload failed."
+        uploads.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        assert len(aws.download_from_s3(BUCKET, file_name)) == len(df), "Download lost rows."
+        downloads.append(time.perf_counter() - start)
+    return min(uploads), min(downloads)
+
+
+def run(rows, part_size_mib, concurrency, latency_ms, connection_mibps, repeat):
+    df = make_tweets(rows, 0.0)
+    frames = {'csv': df, 'parquet': DataProcessor(df.copy()).apply_schema().df}
+    process, endpoint_url = start_s3_process()
+    try:
+        single = AwsControl('testing', 'testing', 'us-east-1', endpoint_url,
+                            max_concurrency=1)
+        single.get_client().create_bucket(Bucket=BUCKET)
+        add_network(single, latency_ms / 1000, connection_mibps * 2 ** 20)
+        for file_format, frame in frames.items():
+            file_name = f"bench.{file_format}"
+            size_mib = len(single.serialize(frame, file_name)) / 2 ** 20
+            for workers in [1] + concurrency:
+                aws = AwsControl('testing', 'testing', 'us-east-1', endpoint_url,
+                                 part_size=part_size_mib * 2 ** 20, max_concurrency=workers,
+                                 multipart_threshold=2 * part_size_mib * 2 ** 20,
+                                 download_concurrency=workers)
+                upload, download = transfer(aws, frame, file_name, repeat)
+                label = 'single-shot' if workers == 1 else f"concurrency={workers}"
+                print(f"{file_format:8} {size_mib:6.1f}MiB {label:16} "
+                      f"upload={size_mib / upload:7.1f}MiB/s download={size_mib / download:7.1f}MiB/s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Concurrent multipart and ranged S3 transfers against single requests')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--part-size', type=int, default=8, help='MiB, at least 5')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--latency', type=float, default=20,
+                        help='ms added to every request to mimic a round trip to S3')
+    parser.add_argument('--connection-mibps', type=float, default=50,
+                        help='per-request throughput cap in MiB/s; 0 disables it')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.part_size, args.concurrency, args.latency,
+        args.connection_mibps, args.repeat)
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer import SentimentAnalyzer
+from synthetic import make_tweets
+
+
+def run(rows, duplicate_ratio):
+    """Times row-by-row and batch scoring and checks that both agree."""
+    df = make_tweets(rows, duplicate_ratio)
+
+    start = time.perf_counter()
+    expected = SentimentAnalyzer(df.copy()).analyze()
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = SentimentAnalyzer(df.copy()).analyze(batch=True)
+    batch_seconds = time.perf_counter() - start
+
+    pd.testing.assert_series_equal(actual['compound'], expected['compound'])
+    pd.testing.assert_series_equal(actual['sentiment'], expected['sentiment'])
+
+    scores = SentimentAnalyzer(df).score_batch(df['text'])
+    reference = pd.DataFrame(list(expected['scores']), index=df.index)
+    pd.testing.assert_frame_equal(scores, reference[scores.columns])
+
+    print(f"rows={rows} apply={apply_seconds:.2f}s ({rows / apply_seconds:,.0f} rows/s) "
+          f"batch={batch_seconds:.2f}s ({rows / batch_seconds:,.0f} rows/s) "
+          f"speedup={apply_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sentiment scoring throughput')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.duplicate_ratio)
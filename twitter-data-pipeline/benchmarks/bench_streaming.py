@@ -0,0 +1,68 @@
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import TwitterETL
+from script import AwsControl
+from synthetic import make_tweets
+from s3_stub import start_s3_server
+from child import peak_rss_mib, run_child, child_main
+
+RAW_BUCKET = 'bench-raw'
+
+
+def run_transformation(endpoint_url, processed_bucket, stream_chunk_size):
+    """Runs one transformation against the S3 stand-in and returns peak RSS in MiB."""
+    etl = TwitterETL(stream_chunk_size=stream_chunk_size)
+    etl.aws = AwsControl('testing', 'testing', 'us-east-1', endpoint_url)
+    etl.raw_data_bucket_name = RAW_BUCKET
+    etl.processed_data_bucket_name = processed_bucket
+    etl.raw_file_name = 'bench.csv'
+    etl.twitter_data_transformation()
+    return peak_rss_mib()
+
+
+def child(endpoint_url, processed_bucket, stream_chunk_size):
+    return {'peak_rss_mib': run_transformation(endpoint_url, processed_bucket,
+                                               int(stream_chunk_size) or None)}
+
+
+def measure(endpoint_url, processed_bucket, stream_chunk_size):
+    """Runs a transformation in a fresh process so peak RSS is its own."""
+    return run_child(__file__, endpoint_url, processed_bucket,
+                     stream_chunk_size or 0)['peak_rss_mib']
+
+
+def main(rows, stream_chunk_size):
+    server, endpoint_url = start_s3_server()
+    try:
+        aws = AwsControl('testing', 'testing', 'us-east-1', endpoint_url)
+        s3 = aws.get_client()
+        for bucket in [RAW_BUCKET, 'bench-full', 'bench-streaming']:
+            s3.create_bucket(Bucket=bucket)
+        aws.upload_to_s3(make_tweets(rows), 'bench.csv', RAW_BUCKET)
+
+        full_rss = measure(endpoint_url, 'bench-full', None)
+        streaming_rss = measure(endpoint_url, 'bench-streaming', stream_chunk_size)
+
+        full = s3.get_object(Bucket='bench-full', Key='analyzed_bench.csv')['Body'].read()
+        streamed = s3.get_object(Bucket='bench-streaming', Key='analyzed_bench.csv')['Body'].read()
+        assert full == streamed, "Streaming output differs from the full-frame output."
+        assert streaming_rss < full_rss, "Streaming mode did not lower peak RSS."
+        print(f"rows={rows} full_peak_rss={full_rss:.0f}MiB "
+              f"streaming_peak_rss={streaming_rss:.0f}MiB "
+              f"(chunk_size={stream_chunk_size})")
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    child_main(child)
+
+    parser = argparse.ArgumentParser(description='Streaming transform peak memory')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args()
+    main(args.rows, args.chunk_size)
@@ -0,0 +1,50 @@
+import os
+import sys
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import TwitterETL
+from html_fixture import write_fixture, serve
+
+
+def scrape(url, queries, warm):
+    """Scrapes `queries` searches in a row and returns the per-query timings."""
+    etl = TwitterETL(scrape_pool_size=1, warm_drivers=warm,
+                     scraper_options={'headless': True, 'base_url': url,
+                                      'scroll_wait': 0.5, 'max_scroll_wait': 1})
+    for number in range(queries):
+        etl.scrape_query(f"zomato {number}")
+    if etl.driver_pool is not None:
+        print(f"pool: {etl.driver_pool.stats()}")
+        etl.driver_pool.close()
+    return etl.scrape_timings
+
+
+def summarize(label, timings):
+    for name in ('driver_startup', 'time_to_first_article', 'scrape'):
+        first = timings[0].get(name, 0.0)
+        rest = [timing.get(name, 0.0) for timing in timings[1:]]
+        later = sum(rest) / len(rest) if rest else 0.0
+        print(f"{label} {name}: first={first:.2f}s later_avg={later:.2f}s")
+
+
+def run(articles, queries):
+    """Compares cold browsers per query with one warm pooled session."""
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixture(directory, articles)
+        server, url = serve(directory)
+        try:
+            summarize('cold', scrape(url, queries, warm=False))
+            summarize('warm', scrape(url, queries, warm=True))
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cold versus warm WebDriver sessions')
+    parser.add_argument('--articles', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=5)
+    args = parser.parse_args()
+    run(args.articles, args.queries)
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import boto3
+import importlib
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from s3_stub import start_s3_server
+
+# Dummy settings lambda.py reads at import.
+for name, value in {'DB_NAME': 'dev', 'DB_USER': 'user', 'DB_PASSWORD': 'password',
+                    'DB_HOST': 'localhost', 'DB_PORT': '5439',
+                    'Access_key': 'testing', 'Secret_access_key': 'testing'}.items():
+    os.environ.setdefault(name, value)
+lam = importlib.import_module('lambda')
+
+BUCKET = 'check-processed'
+PREFIX = 'keyword=zomato/date=2024-01-01/'
+
+
+class FakeCursor:
+    """Records statements; a COPY fails when its file or manifest lists a 'bad' key."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if query.startswith('COPY'):
+            from_path = query.split("FROM '", 1)[1].split("'", 1)[0]
+            urls = [from_path]
+            if 'MANIFEST' in query:
+                bucket_name, _, key = from_path[len('s3://'):].partition('/')
+                manifest = json.loads(self.conn.s3.get_object(
+                    Bucket=bucket_name, Key=key)['Body'].read())
+                self.conn.manifests.append(manifest)
+                urls = [entry['url'] for entry in manifest['entries']]
+            if any('bad' in url for url in urls):
+                raise psycopg2.Error(f"Load failed for {from_path}")
+            self.conn.copied.append(urls)
+        self.conn.statements.append(query)
+
+
+class FakeConnection:
+    def __init__(self, s3):
+        self.s3 = s3
+        self.statements = []
+        self.copied = []
+        self.manifests = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def event(file_names, sizes):
+    # S3 events URL-encode the key, eg:- spaces become '+'.
+    return {'Records': [{'s3': {'bucket': {'name': BUCKET},
+                                'object': {'key': file_name.replace(' ', '+'),
+                                           'size': sizes[file_name]}}}
+                        for file_name in file_names]}
+
+
+def run_case(s3, file_names):
+    """Uploads the files, invokes the handler and returns what it did."""
+    sizes = {}
+    for file_name in file_names:
+        body = b'user,username,created_at\n1,a,2024-01-01\n'
+        s3.put_object(Bucket=BUCKET, Key=file_name, Body=body)
+        sizes[file_name] = len(body)
+    conn = FakeConnection(s3)
+    deletes = []
+    handler = lambda params, **kwargs: deletes.append(
+        [item['Key'] for item in params['Delete']['Objects']])
+    s3.meta.events.register('before-parameter-build.s3.DeleteObjects', handler)
+    lam.get_connection = lambda: conn
+    try:
+        response = lam.lambda_handler(event(file_names, sizes), None)
+    finally:
+        s3.meta.events.unregister('before-parameter-build.s3.DeleteObjects', handler)
+    left = [obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET).get('Contents', [])]
+    for key in left:
+        s3.delete_object(Bucket=BUCKET, Key=key)
+    return response, conn, deletes, left
+
+
+def check(s3):
+    """Returns the expectations the Lambda load did not meet."""
+    failures = []
+
+    def expect(condition, message):
+        if not condition:
+            failures.append(message)
+
+    # A clean batch is one manifest COPY and one commit, then bulk deletes
+    # of DELETE_BATCH_SIZE keys each.
+    lam.DELETE_BATCH_SIZE = 2
+    good = [f"{PREFIX}analyzed_{number} part.csv" for number in range(5)]
+    response, conn, deletes, left = run_case(s3, good)
+    expect(response['statusCode'] == 200, f"clean batch returned {response}")
+    expect(len(conn.manifests) == 1, f"{len(conn.manifests)} manifest COPYs, expected 1")
+    if conn.manifests:
+        entries = conn.manifests[0]['entries']
+        expect([entry['url'] for entry in entries] == [f"s3://{BUCKET}/{name}" for name in good],
+               f"manifest lists {entries}")
+        expect(all(entry['mandatory'] and entry['meta']['content_length'] > 0
+                   for entry in entries), "manifest entries lack mandatory or content_length")
+    expect(conn.commits == 1, f"clean batch committed {conn.commits} times")
+    expect(deletes == [good[0:2], good[2:4], good[4:]], f"delete_objects calls were {deletes}")
+    expect(left == [], f"clean batch left {left} in S3")
+    expect(any("%s FROM load_staging" in query for query in conn.statements),
+           "keyword files did not go through the staging table")
+
+    # A bad file fails the manifest COPY; every file is then loaded on its
+    # own, the rest still load and the handler reports the bad one.
+    lam.DELETE_BATCH_SIZE = 1000
+    mixed = [f"{PREFIX}analyzed_good_1.csv", f"{PREFIX}analyzed_bad.csv",
+             f"{PREFIX}analyzed_good_2.csv"]
+    response, conn, deletes, left = run_case(s3, mixed)
+    expect(response['statusCode'] == 207, f"mixed batch returned {response}")
+    failed = json.loads(response['body']).get('failed', {}) if response['statusCode'] == 207 else {}
+    expect(list(failed) == [mixed[1]], f"reported failures {failed}")
+    expect(conn.copied == [[f"s3://{BUCKET}/{mixed[0]}"], [f"s3://{BUCKET}/{mixed[2]}"]],
+           f"per-file fallback copied {conn.copied}")
+    expect(conn.rollbacks == 2, f"mixed batch rolled back {conn.rollbacks} times, expected 2")
+    expect(conn.commits == 2, f"mixed batch committed {conn.commits} times, expected 2")
+    expect(deletes == [], f"mixed batch bulk-deleted {deletes}")
+    expect(left == [mixed[1]], f"mixed batch left {left} in S3, expected only the bad file")
+    return failures
+
+
+if __name__ == '__main__':
+    server, endpoint_url = start_s3_server()
+    try:
+        s3 = boto3.client('s3', endpoint_url=endpoint_url, region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+        s3.create_bucket(Bucket=BUCKET)
+        lam.s3_client = s3
+        failures = check(s3)
+    finally:
+        server.stop()
+    for failure in failures:
+        print(f"FAILED {failure}")
+    print(f"Lambda load check: {len(failures)} failures")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,67 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.sentiment.vader import SentiText
+from analyzer import BatchSentiText, SentimentAnalyzer, get_vader
+
+# Texts where the batch tokenizer or aggregation could drift from VADER.
+CASES = [
+    # Punctuation before a word (punc_before) and after it.
+    "!!great food", "...awful service", "'good' delivery", "(terrible) wait",
+    "#love this", "@zomato thanks!", "?!bad", "good!!!", "\"nice\"",
+    # Punctuation on both sides and inside words.
+    "!!great!!", "..bad..", "e-mail refund", "half-baked pizza", "it's o.k.",
+    # Contractions and negations.
+    "I don't like it", "it isn't bad", "can't complain", "won't order again",
+    "wasn't good, wasn't terrible", "didn't hate it", "ain't great",
+    # Emoticons alone, inside words and next to punctuation.
+    ":) great", "great :)", "great:)", ":-( late again", "food:(", "<3 zomato",
+    ":D:D", "lol:) ok", ";) sure", ":/ meh", "hmm:-)", "(:", "xD",
+    # "kind of" and other boosters.
+    "kind of good", "kind of bad", "it was kind of", "kind", "kind of kind of great",
+    "very good", "extremely bad", "barely ok", "sort of nice",
+    # Mixed question and exclamation marks.
+    "good?!", "bad?!?!", "great??", "awful???", "nice????", "ok!?", "love it!!!!!",
+    "what?! no way", "really?? amazing!!", "terrible?!?!?!?!",
+    # But, caps and repeated words.
+    "good but slow", "GREAT service", "GREAT but LATE", "bad bad bad", "good GOOD good",
+    # Empty, whitespace and single-character texts.
+    "", " ", "a", "!", "?", ":)", "   good   ",
+    # Non-ASCII text.
+    "très bon 👍", "😀 great", "naïve café", "ok\ttab\nnewline",
+]
+COLUMNS = ['neg', 'neu', 'pos', 'compound']
+
+
+def check(cases):
+    """Returns the cases whose tokens or scores differ from VADER."""
+    sid = get_vader()[0]
+    mismatches = []
+    for text in cases:
+        expected = SentiText(text, sid.constants.PUNC_LIST,
+                             sid.constants.REGEX_REMOVE_PUNCTUATION).words_and_emoticons
+        actual = BatchSentiText(text, sid.constants.PUNC_LIST,
+                                sid.constants.REGEX_REMOVE_PUNCTUATION).words_and_emoticons
+        if actual != expected:
+            mismatches.append(f"{text!r}: tokens {actual} != {expected}")
+
+    texts = pd.Series(cases, dtype=object)
+    analyzer = SentimentAnalyzer(pd.DataFrame({'text': texts}))
+    for name, scores in (('score_unique', analyzer.score_unique(texts)),
+                         ('score_batch', analyzer.score_batch(texts))):
+        for text, row in zip(cases, scores[COLUMNS].to_dict('records')):
+            expected = sid.polarity_scores(text)
+            if row != {column: expected[column] for column in COLUMNS}:
+                mismatches.append(f"{name} {text!r}: {row} != {expected}")
+    return mismatches
+
+
+if __name__ == '__main__':
+    mismatches = check(CASES)
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print(f"{len(CASES)} cases, {len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,30 @@
+import sys
+import json
+import resource
+import subprocess
+
+
+def peak_rss_mib():
+    """Returns the peak resident set size of this process in MiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(script, *args):
+    """
+    Runs `script --child args...` in a fresh process, so its peak RSS is its
+    own, and returns the JSON result it printed last.
+    """
+    command = [sys.executable, script, '--child', *[str(arg) for arg in args]]
+    output = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def child_main(run):
+    """
+    When started by run_child, prints the result of `run` called with the
+    string arguments and exits; otherwise returns to the caller.
+    """
+    if sys.argv[1:2] != ['--child']:
+        return
+    print(json.dumps(run(*sys.argv[2:])))
+    sys.exit(0)
@@ -0,0 +1,57 @@
+import os
+import random
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from scraper import (ARTICLE_CSS, USER_CSS, USERNAME_CSS, NAME_CSS, TEXT_CSS,
+                     COUNT_CSS)
+from synthetic import make_text
+
+
+def classes(selector):
+    """Turns a compound class selector into a class attribute value."""
+    return ' '.join(selector.split('.')[1:])
+
+
+def make_article(rng, number):
+    handle = f"handle{rng.randint(0, 999)}"
+    return f"""
+<article class="{classes(ARTICLE_CSS)}">
+  <div class="{classes(USER_CSS)}"><span class="{classes(NAME_CSS)}">User {handle}</span></div>
+  <div class="{classes(USERNAME_CSS)}">
+    <span class="{classes(NAME_CSS)}">@{handle}</span>
+    <a href="/{handle}/status/{1690000000000000000 + number}"><time datetime="2023-08-13T{number // 3600 % 24:02d}:{number // 60 % 60:02d}:{number % 60:02d}.000Z">Aug 13</time></a>
+  </div>
+  <div class="{classes(TEXT_CSS)}">{make_text(rng)}</div>
+  <div class="{classes(COUNT_CSS)}" aria-label="{rng.randint(0, 50)} replies, {rng.randint(0, 99)} Retweets, {rng.randint(0, 500)} likes, {rng.randint(0, 20000)} views"></div>
+</article>"""
+
+
+def write_fixture(directory, articles, name='search.html', seed=0):
+    """Writes a static page shaped like the Twitter search timeline."""
+    rng = random.Random(seed)
+    body = ''.join(make_article(rng, number) for number in range(articles))
+    path = os.path.join(directory, name)
+    with open(path, 'w') as page:
+        page.write(f"<!DOCTYPE html><html><body>{body}</body></html>")
+    return path
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def translate_path(self, path):
+        # Serve the search timeline for /search?q=... like twitter.com does.
+        if path.startswith('/search'):
+            path = '/search.html'
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory):
+    """Serves a directory over HTTP in a background thread."""
+    handler = partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
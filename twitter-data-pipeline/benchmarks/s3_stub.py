@@ -0,0 +1,41 @@
+import sys
+import time
+import socket
+import logging
+import subprocess
+from moto.server import ThreadedMotoServer
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_s3_server():
+    """Starts a local moto S3 server and returns it with its endpoint URL."""
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port)
+    server.start()
+    return server, f"http://127.0.0.1:{port}"
+
+
+def start_s3_process(timeout=30):
+    """
+    Starts moto S3 in its own process, so the server does not compete with
+    the client for the GIL, and returns the process with its endpoint URL.
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'moto.server', '-H', '127.0.0.1', '-p', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The moto S3 server did not start.")
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import pandas as pd
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_tweets
+from baselines import check_baselines
+from child import peak_rss_mib, run_child, child_main
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+STAGES = ['remove_duplicates', 'convert_utc_to_ist', 'analyze',
+          'csv_roundtrip', 'parquet_roundtrip']
+BUCKET = 'bench-suite'
+
+
+def roundtrip(aws, df, file_format):
+    """Uploads and downloads a frame through AwsControl."""
+    from script import DataProcessor
+    file_name = f"suite.{file_format}"
+    if file_format == 'parquet':
+        df = DataProcessor(df).apply_schema().df
+    aws.upload_to_s3(df, file_name, BUCKET)
+    aws.download_from_s3(BUCKET, file_name)
+
+
+def run_stage(stage, corpus_path, repeat):
+    """
+    Times one stage on the corpus and returns the fastest of `repeat` runs;
+    runs in its own process. Round-trips go through a local S3 stand-in.
+    """
+    from script import AwsControl, DataProcessor
+    from analyzer import SentimentAnalyzer
+    from s3_stub import start_s3_server
+    corpus = pd.read_parquet(corpus_path)
+    server = aws = None
+    if stage in ('csv_roundtrip', 'parquet_roundtrip'):
+        server, endpoint_url = start_s3_server()
+        aws = AwsControl('testing', 'testing', 'us-east-1', endpoint_url)
+        aws.get_client().create_bucket(Bucket=BUCKET)
+    try:
+        timings = []
+        for _ in range(repeat):
+            df = corpus.copy()
+            start = time.perf_counter()
+            if stage == 'remove_duplicates':
+                DataProcessor(df).remove_duplicates()
+            elif stage == 'convert_utc_to_ist':
+                DataProcessor(df).convert_utc_to_ist('created_at')
+            elif stage == 'analyze':
+                SentimentAnalyzer(df).analyze(batch=True)
+            else:
+                roundtrip(aws, df, stage.split('_')[0])
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+def child(stage, corpus_path, repeat):
+    seconds = run_stage(stage, corpus_path, int(repeat))
+    return {'seconds': seconds, 'peak_rss_mib': peak_rss_mib()}
+
+
+def measure(stage, rows, corpus_path, repeat):
+    """Runs a stage in a fresh process so peak RSS is its own."""
+    result = run_child(__file__, stage, corpus_path, repeat)
+    return {'rows_per_second': rows / result['seconds'],
+            'seconds': result['seconds'],
+            'peak_rss_mib': result['peak_rss_mib']}
+
+
+def compare(results, baselines, throughput_threshold, memory_threshold, min_seconds):
+    """
+    Returns the regressions of `results` against the stored baselines.
+    Stages faster than `min_seconds` are too noisy for a throughput check.
+    """
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        slowest = baseline['rows_per_second'] * (1 - throughput_threshold)
+        if result['seconds'] >= min_seconds and result['rows_per_second'] < slowest:
+            regressions.append(
+                f"{key}: {result['rows_per_second']:,.0f} rows/s is below "
+                f"{slowest:,.0f} (baseline {baseline['rows_per_second']:,.0f})")
+        largest = baseline['peak_rss_mib'] * (1 + memory_threshold)
+        if result['peak_rss_mib'] > largest:
+            regressions.append(
+                f"{key}: peak RSS {result['peak_rss_mib']:.0f}MiB is above "
+                f"{largest:.0f}MiB (baseline {baseline['peak_rss_mib']:.0f}MiB)")
+    return regressions
+
+
+def main(sizes, stages, duplicate_ratio, throughput_threshold, memory_threshold,
+         update_baseline, repeat, min_seconds):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            corpus_path = os.path.join(directory, f"tweets_{rows}.parquet")
+            make_tweets(rows, duplicate_ratio).to_parquet(corpus_path, index=False)
+            for stage in stages:
+                key = f"{stage}@{rows}"
+                results[key] = measure(stage, rows, corpus_path, repeat)
+                print(f"{key:30} {results[key]['rows_per_second']:>14,.0f} rows/s "
+                      f"{results[key]['seconds']:8.2f}s "
+                      f"peak_rss={results[key]['peak_rss_mib']:7.0f}MiB")
+
+    return check_baselines(
+        BASELINE_PATH, results, update_baseline,
+        partial(compare, throughput_threshold=throughput_threshold,
+                memory_threshold=memory_threshold, min_seconds=min_seconds))
+
+
+if __name__ == '__main__':
+    child_main(child)
+
+    parser = argparse.ArgumentParser(
+        description='Offline transform benchmarks checked against stored baselines')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help='eg:- 10000 100000 1000000 10000000')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3)
+    parser.add_argument('--throughput-threshold', type=float, default=0.25,
+                        help='allowed fractional drop in rows/s')
+    parser.add_argument('--memory-threshold', type=float, default=0.25,
+                        help='allowed fractional growth in peak RSS')
+    parser.add_argument('--min-seconds', type=float, default=0.1,
+                        help='skip the throughput check of shorter stages')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per stage; the fastest one is kept')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+    sys.exit(main(args.sizes, args.stages, args.duplicate_ratio,
+                  args.throughput_threshold, args.memory_threshold,
+                  args.update_baseline, args.repeat, args.min_seconds))
@@ -0,0 +1,49 @@
+import random
+import numpy as np
+import pandas as pd
+
+
+WORDS = ['zomato', 'order', 'delivery', 'food', 'restaurant', 'app', 'refund',
+         'rider', 'my', 'the', 'was', 'is', 'not', 'very', 'so', 'but', 'never',
+         'today', 'again', 'late', 'cold', 'great', 'good', 'love', 'amazing',
+         'bad', 'worst', 'terrible', 'awful', 'happy', 'thanks', 'sad', 'angry',
+         'fast', 'slow', 'missing', 'delicious', 'hungry', 'pathetic', 'fantastic']
+ENDINGS = ['', '', '', '!', '!!', '?', '??', ' :)', ' :(', ' @zomato', ' #zomato']
+
+
+def make_text(rng):
+    """Builds a tweet-like sentence from the synthetic vocabulary."""
+    words = rng.choices(WORDS, k=rng.randint(4, 30))
+    if rng.random() < 0.1:
+        words = [word.upper() for word in words]
+    return ' '.join(words) + rng.choice(ENDINGS)
+
+
+def make_tweets(rows, duplicate_ratio=0.3, seed=0):
+    """
+    Generates a DataFrame shaped like TwitterScraper.scrap_tweets output.
+    `duplicate_ratio` of the rows are exact copies of earlier rows, as produced
+    by re-seen articles and overlapping scrape windows.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    unique_rows = max(int(rows * (1 - duplicate_ratio)), 1)
+
+    users = [f"user {i}" for i in range(max(unique_rows // 20, 1))]
+    user_ids = np_rng.integers(0, len(users), unique_rows)
+    created_at = pd.Timestamp('2023-08-13', tz='UTC') + pd.to_timedelta(
+        np_rng.integers(0, 86400, unique_rows), unit='s')
+    df = pd.DataFrame({
+        'user': [users[i] for i in user_ids],
+        'username': [f"@handle{i}" for i in user_ids],
+        'text': [make_text(rng) for _ in range(unique_rows)],
+        'created_at': created_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'like_count': np_rng.integers(0, 500, unique_rows),
+        'reply_count': np_rng.integers(0, 50, unique_rows),
+        'retweet_count': np_rng.integers(0, 100, unique_rows),
+        'views_count': np_rng.integers(0, 20000, unique_rows),
+    })
+
+    repeats = np_rng.integers(0, unique_rows, rows - unique_rows)
+    positions = np.concatenate([np.arange(unique_rows), repeats])
+    return df.iloc[positions].reset_index(drop=True)
@@ -0,0 +1,121 @@
+import sqlite3
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+
+
+class SentimentCache:
+    """
+    Persistent SQLite cache of VADER scores keyed by a hash of the normalized
+    text. Entries are evicted least recently used first once the cache holds
+    more than `max_entries`, and the whole cache is dropped when `version`
+    changes.
+    """
+    COLUMNS = ['neg', 'neu', 'pos', 'compound']
+    MAX_ENTRIES = 1000000
+
+    def __init__(self, path, version, max_entries=None):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+
+        # run_keywords shares one analyzer across worker threads and
+        # serializes its use with TwitterETL.analyzer_lock.
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores (hash BLOB PRIMARY KEY, neg REAL, "
+            "neu REAL, pos REAL, compound REAL, last_used INTEGER) WITHOUT ROWID")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        self.conn.execute(
+            "CREATE TEMP TABLE lookup (position INTEGER PRIMARY KEY, hash BLOB)")
+
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            if row is not None:
+                logging.info("Sentiment cache version changed, clearing stale entries.")
+            self.conn.execute("DELETE FROM scores")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self.clock = self.conn.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM scores").fetchone()[0]
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(text):
+        """Hashes the text with runs of whitespace collapsed."""
+        normalized = " ".join(text.split())
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
+    def fetch(self, texts, score_func):
+        """
+        Returns scores for a Series of distinct texts as a DataFrame.
+        Texts missing from the cache are scored with `score_func` and stored.
+        """
+        keys = [self.make_key(text) for text in texts]
+        self.clock += 1
+
+        self.conn.execute("DELETE FROM lookup")
+        self.conn.executemany(
+            "INSERT INTO lookup VALUES (?, ?)", enumerate(keys))
+        rows = self.conn.execute(
+            "SELECT lookup.position, neg, neu, pos, compound FROM lookup "
+            "JOIN scores ON scores.hash = lookup.hash").fetchall()
+        self.conn.execute(
+            "UPDATE scores SET last_used = ? WHERE hash IN (SELECT hash FROM lookup)",
+            (self.clock,))
+
+        values = np.full((len(keys), len(self.COLUMNS)), np.nan)
+        found = np.zeros(len(keys), dtype=bool)
+        if rows:
+            cached = np.array(rows, dtype=np.float64)
+            positions = cached[:, 0].astype(np.int64)
+            values[positions] = cached[:, 1:]
+            found[positions] = True
+
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            scored = score_func(texts.iloc[missing])[self.COLUMNS].to_numpy()
+            values[missing] = scored
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)",
+                ((keys[position], *row, self.clock)
+                 for position, row in zip(missing.tolist(), scored.tolist())))
+            self.evict()
+        self.conn.commit()
+
+        self.hits += int(found.sum())
+        self.misses += len(missing)
+        return pd.DataFrame(values, columns=self.COLUMNS, index=texts.index)
+
+    def evict(self):
+        """Drops the least recently used entries above max_entries."""
+        count = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM scores WHERE hash IN "
+                "(SELECT hash FROM scores ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,))
+            logging.info(
+                f"Evicted {count - self.max_entries} entries from the sentiment cache.")
+
+    def log_stats(self):
+        """Logs the hit and miss counters."""
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        logging.info(
+            f"Sentiment cache: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.1%} hit rate).")
+
+    def close(self):
+        self.conn.close()
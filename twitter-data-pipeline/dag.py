@@ -1,17 +1,70 @@
+import os
 from datetime import timedelta, datetime
 from airflow import DAG
-from airflow.operators.python import PythonOperator
-from main import TwitterETL
+from airflow.decorators import task, task_group
 
-# Create an instance of your class
-etl = TwitterETL()
+# TwitterETL arguments, eg:- {'shard_hours': 6, 'scraper_options': {'headless': True}}
+# Each time shard becomes its own mapped extract -> transform -> load group.
+ETL_OPTIONS = {}
+# Load processed files from the DAG instead of the S3-triggered lambda.
+# Remove the S3 event trigger when enabling this, or files load twice.
+LOAD_IN_DAG = os.environ.get('TWITTER_DAG_LOAD_IN_DAG', 'false').lower() == 'true'
+# Airflow connection holding the Redshift host, port, database and login.
+REDSHIFT_CONN_ID = 'redshift_default'
+# COPY statements running at once across the mapped load tasks.
+LOAD_CONCURRENCY = 2
+# Incremental runs share one watermark, which an S3 store cannot lock, so
+# they must not overlap.
+DAG_OPTIONS = {'max_active_runs': 1} if ETL_OPTIONS.get('incremental') else {}
 
-# Define the functions to be used in PythonOperator
-def twitter_data_extraction():
-    etl.twitter_data_extraction()
 
-def twitter_data_transformation():
-    etl.twitter_data_transformation()
+def create_etl():
+    """
+    Builds the pipeline inside the running task. Importing main pulls in
+    pandas, numpy and boto3, which the scheduler should not load on every
+    DAG parse; selenium and nltk wait for the tasks that scrape or score.
+    """
+    from main import TwitterETL
+    return TwitterETL(**ETL_OPTIONS)
+
+
+# Define the functions to be used in the tasks. Only S3 keys and query
+# strings go through XCom, never data frames.
+@task
+def plan_queries():
+    return create_etl().plan_queries()
+
+@task
+def twitter_data_extraction(query):
+    return create_etl().extract_query(query)
+
+@task
+def twitter_data_transformation(raw_file_name):
+    if raw_file_name is None:
+        return None
+    return create_etl().twitter_data_transformation(raw_file_name)
+
+@task(max_active_tis_per_dag=LOAD_CONCURRENCY)
+def redshift_load(processed_file_name):
+    if processed_file_name is None:
+        return
+    import psycopg2
+    from airflow.hooks.base import BaseHook
+    redshift = BaseHook.get_connection(REDSHIFT_CONN_ID)
+    conn = psycopg2.connect(dbname=redshift.schema, user=redshift.login,
+                            password=redshift.password, host=redshift.host,
+                            port=redshift.port)
+    try:
+        create_etl().load_processed_data(processed_file_name, conn)
+    finally:
+        conn.close()
+
+@task_group
+def twitter_etl(query):
+    processed_file_name = twitter_data_transformation(
+        twitter_data_extraction(query))
+    if LOAD_IN_DAG:
+        redshift_load(processed_file_name)
 
 # Set default arguments for the DAG
 default_args = {
@@ -26,25 +79,12 @@ default_args = {
 }
 
 # Create the DAG instance
-dag = DAG(
+with DAG(
     'twitter_dag',
     default_args=default_args,
     description='Twitter ETL',
     schedule_interval='@daily',
-)
-
-# Create the PythonOperator for running the ETL tasks
-run_extraction = PythonOperator(
-    task_id='twitter_data_extraction',
-    python_callable=twitter_data_extraction,
-    dag=dag,
-)
-
-run_transformation = PythonOperator(
-    task_id='twitter_data_transformation',
-    python_callable=twitter_data_transformation,
-    dag=dag,
-)
-
-# Define task order
-run_extraction >> run_transformation
+    **DAG_OPTIONS,
+) as dag:
+    # One mapped task group per query or time shard
+    twitter_etl.expand(query=plan_queries())
@@ -1,7 +1,15 @@
 import boto3
 import psycopg2
 import os
+import json
+import time
+import uuid
 import logging
+import resource
+from urllib.parse import unquote_plus
+from botocore.config import Config
+from redshift_sql import (get_copy_format, get_keyword, is_rollup, credentials,
+                          copy_into, load_rollup)
 
 
 # Environment Variables
@@ -14,9 +22,37 @@ DB_PARAMS = {
 }
 ACCESS_KEY = os.environ['Access_key']
 ACCESS_SECRET = os.environ['Secret_access_key']
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 10))
+# Load all files of an event with one manifest COPY instead of one COPY per file.
+BATCH_LOAD = os.environ.get('BATCH_LOAD', 'true').lower() == 'true'
+MANIFEST_PREFIX = 'manifests/'
+# Replace rows already in the table instead of appending (exactly-once loads).
+MERGE_LOAD = os.environ.get('MERGE_LOAD', 'false').lower() == 'true'
+CREDENTIALS = credentials(ACCESS_KEY, ACCESS_SECRET)
+# delete_objects accepts at most this many keys per request.
+DELETE_BATCH_SIZE = 1000
 
 logging.basicConfig(level=logging.INFO)
 
+# Kept at module scope so warm invocations reuse them.
+s3_client = None
+connection = None
+COUNTERS = {
+    'clients_created': 0,
+    'clients_reused': 0,
+    'connections_created': 0,
+    'connections_reused': 0,
+}
+
+
+def log_stage(stage, start, start_cpu, **fields):
+    """Logs the wall time, CPU time and peak RSS of a stage as one JSON line."""
+    logging.info(json.dumps({
+        'stage': stage,
+        'wall_seconds': time.perf_counter() - start,
+        'cpu_seconds': time.process_time() - start_cpu,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **fields}))
 
 def create_connection():
     try:
@@ -27,31 +63,167 @@ def create_connection():
         logging.error(f"Error occurred: {e}")
         raise
 
+def get_connection():
+    """Returns the cached connection, reconnecting if it fails a health check."""
+    global connection
+    if connection is not None and not connection.closed:
+        try:
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1")
+            connection.rollback()
+            COUNTERS['connections_reused'] += 1
+            return connection
+        except psycopg2.Error as e:
+            logging.warning(f"Connection health check failed, reconnecting: {e}")
+            try:
+                connection.close()
+            except psycopg2.Error:
+                pass
+    connection = create_connection()
+    COUNTERS['connections_created'] += 1
+    return connection
+
+def get_s3_client():
+    """Returns the cached S3 client, creating it on first use."""
+    global s3_client
+    if s3_client is None:
+        s3_client = boto3.client(
+            's3', config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS))
+        COUNTERS['clients_created'] += 1
+    else:
+        COUNTERS['clients_reused'] += 1
+    return s3_client
+
 def delete_csv(bucket, file_name):
-    s3 = boto3.client('s3')
+    s3 = get_s3_client()
     s3.delete_object(Bucket=bucket, Key=file_name)
     logging.info(f"Deleted {file_name} from S3.")
 
+def load_file(cur, from_path, copy_format, keyword, rollup=False):
+    """Copies a file or manifest into its table; rollups go to the summary table."""
+    if rollup:
+        load_rollup(cur, from_path, copy_format, keyword, CREDENTIALS)
+    else:
+        copy_into(cur, from_path, copy_format, keyword, CREDENTIALS, merge=MERGE_LOAD)
+
 def load_data(bucket, file_name, conn):
+    start, start_cpu = time.perf_counter(), time.process_time()
     cur = conn.cursor()
     from_path = f"s3://{bucket}/{file_name}"
-    query = f"COPY public.zomato_data FROM '{from_path}' CREDENTIALS 'aws_access_key_id={ACCESS_KEY};aws_secret_access_key={ACCESS_SECRET}' CSV DELIMITER ',' IGNOREHEADER 1;"
-    cur.execute(query)
+    load_file(cur, from_path, get_copy_format(file_name), get_keyword(file_name),
+              is_rollup(file_name))
     conn.commit()
 
     logging.info(f"Data from {file_name} loaded successfully into Redshift.")
     delete_csv(bucket, file_name)
+    log_stage('load_data', start, start_cpu, files=1)
+
+def delete_files(bucket, file_names):
+    s3 = get_s3_client()
+    for start in range(0, len(file_names), DELETE_BATCH_SIZE):
+        keys = file_names[start:start + DELETE_BATCH_SIZE]
+        response = s3.delete_objects(
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True})
+        for error in response.get('Errors', []):
+            logging.error(f"Failed to delete {error['Key']}: {error['Message']}")
+    logging.info(f"Deleted {len(file_names)} files from S3.")
+
+def write_manifest(bucket, files):
+    """Writes a COPY manifest listing `files` (key, size) and returns its key."""
+    entries = []
+    for file_name, size in files:
+        entry = {'url': f"s3://{bucket}/{file_name}", 'mandatory': True}
+        if size is not None:
+            # Columnar formats require the object size in the manifest.
+            entry['meta'] = {'content_length': size}
+        entries.append(entry)
+    manifest_key = f"{MANIFEST_PREFIX}{uuid.uuid4().hex}.manifest"
+    get_s3_client().put_object(Bucket=bucket, Key=manifest_key,
+                               Body=json.dumps({'entries': entries}))
+    return manifest_key
+
+def load_batch(bucket, files, conn):
+    """
+    Loads files of one format with a single manifest COPY and one commit,
+    then deletes them in bulk. If the COPY fails, the files are loaded one
+    by one so a bad file does not hold back the rest. Returns the errors of
+    the files that could not be loaded.
+    """
+    file_names = [file_name for file_name, _ in files]
+    if len(files) > 1:
+        start, start_cpu = time.perf_counter(), time.process_time()
+        manifest_key = write_manifest(bucket, files)
+        try:
+            cur = conn.cursor()
+            from_path = f"s3://{bucket}/{manifest_key}"
+            load_file(cur, from_path, f"{get_copy_format(file_names[0])} MANIFEST",
+                      get_keyword(file_names[0]), is_rollup(file_names[0]))
+            conn.commit()
+            logging.info(
+                f"Data from {len(file_names)} files loaded successfully into Redshift.")
+            delete_files(bucket, file_names)
+            log_stage('load_batch', start, start_cpu, files=len(files),
+                      bytes=sum(size or 0 for _, size in files))
+            return {}
+        except psycopg2.Error as e:
+            conn.rollback()
+            logging.warning(f"Batched COPY failed, loading files one by one: {e}")
+        finally:
+            get_s3_client().delete_object(Bucket=bucket, Key=manifest_key)
+
+    failures = {}
+    for file_name in file_names:
+        try:
+            load_data(bucket, file_name, conn)
+        except psycopg2.Error as e:
+            conn.rollback()
+            logging.error(f"Failed to load {file_name}: {e}")
+            failures[file_name] = str(e)
+    return failures
+
+def record_key(record):
+    """Returns the object key of an S3 event record; events URL-encode it."""
+    return unquote_plus(record['s3']['object']['key'])
+
+def group_records(records):
+    """
+    Groups the loadable files of an event by bucket, file format, keyword
+    and whether they are rollups.
+    """
+    groups = {}
+    for record in records:
+        bucket_name = record['s3']['bucket']['name']
+        file_name = record_key(record)
+        # Ensure the file is a CSV or Parquet file
+        if file_name.endswith(('.csv', '.parquet')):
+            key = (bucket_name, get_copy_format(file_name), get_keyword(file_name),
+                   is_rollup(file_name))
+            groups.setdefault(key, []).append(
+                (file_name, record['s3']['object'].get('size')))
+    return groups
 
 def lambda_handler(event, context):
     try:
-        with create_connection() as conn:
-            for record in event['Records']:
-                bucket_name = record['s3']['bucket']['name']
-                file_name = record['s3']['object']['key']
-                
-                # Ensure the file is a CSV
-                if file_name.endswith('.csv'):
-                    load_data(bucket_name, file_name, conn)
+        failures = {}
+        with get_connection() as conn:
+            if BATCH_LOAD:
+                for (bucket_name, _, _, _), files in group_records(event['Records']).items():
+                    failures.update(load_batch(bucket_name, files, conn))
+            else:
+                for record in event['Records']:
+                    bucket_name = record['s3']['bucket']['name']
+                    file_name = record_key(record)
+
+                    # Ensure the file is a CSV or Parquet file
+                    if file_name.endswith(('.csv', '.parquet')):
+                        load_data(bucket_name, file_name, conn)
+        logging.info(f"Client and connection reuse: {COUNTERS}")
+        if failures:
+            return {
+                'statusCode': 207,
+                'body': json.dumps({'failed': failures})
+            }
         return {
             'statusCode': 200,
             'body': 'Data loaded into Redshift successfully.'
@@ -1,8 +1,17 @@
+import time
+import queue
 import logging
+import threading
 import config
-from scraper import TwitterScraper
-from analyzer import SentimentAnalyzer
-from script import GetDate, AwsControl, FileHandling, DataProcessor
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from script import GetDate, AwsControl, FileHandling, DataProcessor, SeenKeys
+from metrics import recorder
+import redshift_sql
+from rollups import build_rollups, merge_rollups, COLUMNS as ROLLUP_COLUMNS
+# scraper (selenium), analyzer (nltk), watermark and tweet_index are imported
+# by the stages that use them, so each Airflow task loads only its own.
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -10,87 +19,613 @@ logging.basicConfig(level=logging.DEBUG)
 
 class TwitterETL:
 
-    def __init__(self):
+    def __init__(self, sentiment_workers=None, sentiment_cache_path=None,
+                 stream_chunk_size=None, output_format='csv', incremental=False,
+                 watermark_path=None, shard_hours=None, scrape_pool_size=4,
+                 shard_retries=1, scraper_options=None, warm_drivers=False,
+                 keywords=None, query_workers=4, metrics_path=None,
+                 statsd_address=None, prometheus_textfile=None, lean_processing=False,
+                 tweet_index_path=None, tweet_index_retention_days=None,
+                 micro_batch_rows=5000, micro_batch_seconds=30, micro_batch_queue_size=8,
+                 rollups=False, s3_options=None):
         self.auth_token = config.auth_token
         self.aws_key = config.aws_key
         self.aws_secret = config.aws_secret
         self.raw_data_bucket_name = '<your_raw_data_bucket_name>' # eg:- "kishlay-zomato-raw-data-bucket"
         self.processed_data_bucket_name = '<your_processed_data_bucket_name>' # eg:- "kishlay-zomato-processed-data-bucket"
-        self.aws = AwsControl(self.aws_key, self.aws_secret)
+        # extra AwsControl arguments, eg:- {'part_size': 16 * 1024 * 1024, 'max_concurrency': 8, 'download_concurrency': 4}
+        self.aws = AwsControl(self.aws_key, self.aws_secret, **(s3_options or {}))
+        self.sentiment_workers = sentiment_workers # eg:- 16 to score on every core
+        self.sentiment_cache_path = sentiment_cache_path # eg:- "/var/cache/zomato/sentiment.sqlite"
+        self.stream_chunk_size = stream_chunk_size # eg:- 50000 rows per chunk to bound memory
+        self.output_format = output_format # "csv" or "parquet"
+        self.incremental = incremental # scrape only tweets newer than the watermark
+        self.watermark_path = watermark_path # eg:- "s3://kishlay-zomato-raw-data-bucket/state/watermark.json"
+        self.shard_hours = shard_hours # eg:- 1 to scrape the window as hourly slices in parallel
+        self.scrape_pool_size = scrape_pool_size # browsers running at once when sharding
+        self.shard_retries = shard_retries
+        self.scraper_options = scraper_options or {} # extra TwitterScraper arguments, eg:- {'headless': True}
+        self.warm_drivers = warm_drivers # keep logged-in browsers open across queries and shards
+        self.driver_pool = None
+        self.driver_pool_lock = threading.Lock() # shard and keyword workers ask for the pool at once
+        self.scrape_timings = [] # driver startup, time to first article and scrape seconds per query
+        self.keywords = keywords or ['zomato'] # eg:- ['zomato', 'swiggy', 'zepto']
+        self.partitioned = keywords is not None # write keyword=.../date=... keys
+        self.query_workers = query_workers # keywords scraped and analyzed at once
+        self.analyzer_lock = threading.Lock()
+        self.metrics_path = metrics_path # eg:- "/var/log/zomato/run_report.json"
+        self.statsd_address = statsd_address # eg:- "localhost:8125"
+        self.prometheus_textfile = prometheus_textfile # eg:- "/var/lib/node_exporter/twitter_etl.prom"
+        self.lean_processing = lean_processing # compact dtypes and uint64 dedupe keys in process_data
+        self.tweet_index_path = tweet_index_path # eg:- "s3://kishlay-zomato-processed-data-bucket-state/tweet_index"
+        self.tweet_index_retention_days = tweet_index_retention_days # eg:- 30
+        self.micro_batch_rows = micro_batch_rows # rows per processed file in micro_batch_extraction
+        self.micro_batch_seconds = micro_batch_seconds # flush a smaller file after this many seconds
+        self.micro_batch_queue_size = micro_batch_queue_size # scroll rounds buffered before the scraper waits
+        self.micro_batch_wait = 0.0 # seconds the scraper waited on a full queue
+        self.rollups = rollups # also write hourly and per-user daily sentiment rollups
+        if metrics_path or statsd_address or prometheus_textfile:
+            recorder.enable()
+
+        if output_format not in AwsControl.FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if stream_chunk_size is not None and output_format != 'csv':
+            raise ValueError("The streaming transformation only supports CSV.")
+        if incremental and watermark_path is None:
+            raise ValueError("Incremental extraction needs a watermark_path.")
+        if incremental and len(self.keywords) > 1:
+            raise ValueError("Incremental extraction supports a single keyword.")
 
         try:
-            self.query = self.construct_query()
+            self.window = self.construct_window()
+            self.query = self.construct_query(window=self.window)
             self.raw_file_name = self.construct_filename(self.query)
         except Exception as e:
             logging.error(f"An error occurred during setup: {e}")
             raise
 
-    def construct_query(self):
+    def construct_window(self):
+        """Returns yesterday and today at midnight UTC, the daily search window."""
         gd = GetDate()
         today, yesterday = gd.get_date()
         if today is None or yesterday is None:
             raise ValueError("Error when getting date data.")
-        query = f'zomato lang:en until:{today} since:{yesterday} -filter:replies'
+        return (datetime.strptime(yesterday, "%Y-%m-%d").replace(tzinfo=timezone.utc),
+                datetime.strptime(today, "%Y-%m-%d").replace(tzinfo=timezone.utc))
+
+    def construct_query(self, keyword=None, window=None):
+        keyword = keyword or self.keywords[0]
+        since, until = window or self.construct_window()
+        query = (f'{keyword} lang:en until:{until:%Y-%m-%d} '
+                 f'since:{since:%Y-%m-%d} -filter:replies')
         logging.info(f"Query constructed: {query}")
         return query
 
+    def construct_incremental_query(self, watermark):
+        now = datetime.now(timezone.utc)
+        since = watermark.created_at
+        if since is None:
+            since = now - timedelta(days=1)
+        query = self.construct_window_query(since, now)
+        self.window = (since, now)
+        logging.info(f"Incremental query constructed: {query}")
+        return query
+
+    def construct_window_query(self, since, until, keyword=None):
+        keyword = keyword or self.keywords[0]
+        return (f'{keyword} lang:en until_time:{int(until.timestamp())} '
+                f'since_time:{int(since.timestamp())} -filter:replies')
+
+    def construct_shard_queries(self, keyword=None, window=None):
+        """Splits the search window, self.window by default, into slices of shard_hours."""
+        since, until = window or self.window
+        step = timedelta(hours=self.shard_hours)
+        queries = []
+        while since < until:
+            end = min(since + step, until)
+            queries.append(self.construct_window_query(since, end, keyword))
+            since = end
+        return queries
+
     def construct_filename(self, query):
         fHandle = FileHandling()
-        filename = fHandle.create_filename_by_query(query)
+        if self.partitioned:
+            filename = fHandle.create_partitioned_filename(query, self.output_format)
+        else:
+            filename = fHandle.create_filename_by_query(query, self.output_format)
         logging.info(f"Filename constructed: {filename}")
         return filename
 
+    def construct_processed_filename(self, raw_file_name):
+        """Prefixes the file name, keeping any keyword/date partition path."""
+        path, _, name = raw_file_name.rpartition('/')
+        return f"{path}/analyzed_{name}" if path else f"analyzed_{name}"
+
+    def construct_rollup_filename(self, raw_file_name):
+        """Names the CSV rollup of a raw file, next to its processed file."""
+        path, _, name = raw_file_name.rpartition('/')
+        name = f"rollup_{name.rsplit('.', 1)[0]}.csv"
+        return f"{path}/{name}" if path else name
+
     def twitter_data_extraction(self):
+        """Scrapes and uploads the raw data, returning the raw file name."""
         try:
+            if self.incremental:
+                return self.incremental_data_extraction()
             raw_df = self.scrape_data()
-            self.upload_data(raw_df)
+            if not self.upload_data(raw_df):
+                raise RuntimeError(f"Upload of {self.raw_file_name} failed.")
+            return self.raw_file_name
         except Exception as e:
             logging.error(f"An error occurred during the extraction: {e}")
             raise
+        finally:
+            self.export_metrics()
+
+    def export_metrics(self):
+        """Writes the run report and pushes the configured metric sinks."""
+        if not recorder.enabled:
+            return
+        try:
+            if self.metrics_path is not None:
+                recorder.write_report(self.metrics_path)
+            if self.statsd_address is not None:
+                recorder.push_statsd(self.statsd_address)
+            if self.prometheus_textfile is not None:
+                recorder.write_textfile(self.prometheus_textfile)
+        except Exception as e:
+            # Metrics must never fail the pipeline.
+            logging.error(f"An error occurred while exporting metrics: {e}")
+
+    def incremental_data_extraction(self):
+        """
+        Scrapes only the tweets posted after the stored watermark, uploads
+        them as a new raw file and advances the watermark. Returns None when
+        there is nothing new.
+        """
+        from watermark import WatermarkStore
+        store = WatermarkStore(self.watermark_path, self.aws)
+        with store.lock():
+            watermark = store.load()
+            self.query = self.construct_incremental_query(watermark)
+            self.raw_file_name = self.construct_filename(self.query)
+            raw_df = watermark.filter_new(self.scrape_data())
+            if raw_df is None or raw_df.empty:
+                logging.info("No new tweets since the last run.")
+                return None
+            advanced = watermark.advance(raw_df)
+            # Only move the watermark past tweets that are stored.
+            if not self.upload_data(raw_df):
+                raise RuntimeError(
+                    f"Upload of {self.raw_file_name} failed; the watermark was not advanced.")
+            store.save(advanced)
+        return self.raw_file_name
+
+    def plan_queries(self):
+        """
+        Returns the queries to extract independently, one per time shard when
+        sharding. Incremental runs return [None]: their window comes from the
+        watermark at extraction time.
+        """
+        if self.incremental:
+            return [None]
+        queries = []
+        for keyword in self.keywords:
+            if self.shard_hours is not None:
+                queries += self.construct_shard_queries(keyword)
+            else:
+                queries.append(self.construct_query(keyword, self.window))
+        return queries
+
+    def run_keywords(self):
+        """
+        Extracts and transforms every keyword in one run, query_workers at a
+        time. The keywords share one sentiment analyzer and the process-wide
+        S3 client. Returns the processed file name of each keyword.
+        """
+        analyzer = self.create_analyzer(pd.DataFrame())
+        try:
+            with ThreadPoolExecutor(max_workers=self.query_workers) as executor:
+                processed_file_names = list(executor.map(
+                    lambda keyword: self.run_keyword(keyword, analyzer),
+                    self.keywords))
+        finally:
+            self.close_analyzer(analyzer)
+            self.export_metrics()
+        logging.info(f"Processed {len(self.keywords)} keywords.")
+        return dict(zip(self.keywords, processed_file_names))
+
+    def run_keyword(self, keyword, analyzer):
+        """Scrapes, uploads and analyzes one keyword with a shared analyzer."""
+        # Keywords run in parallel threads, so the window is not kept on self.
+        window = self.construct_window()
+        query = self.construct_query(keyword, window)
+        raw_file_name = self.construct_filename(query)
+        if self.shard_hours is not None:
+            raw_df = self.scrape_shards(keyword, window)
+        else:
+            raw_df = self.scrape_query(query)
+        if raw_df is None or raw_df.empty:
+            logging.info(f"No tweets found for '{keyword}'.")
+            return None
+        if not self.upload_data(raw_df, raw_file_name):
+            raise RuntimeError(f"Upload of {raw_file_name} for '{keyword}' failed.")
+        tweet_index = self.create_tweet_index(raw_file_name)
+        # The analyzer scores one frame at a time.
+        with self.analyzer_lock:
+            processed_df = self.process_data(raw_df, analyzer, tweet_index=tweet_index)
+        processed_file_name = self.upload_processed_data(processed_df, raw_file_name)
+        if processed_file_name is None:
+            raise RuntimeError(f"Upload of the processed {raw_file_name} for '{keyword}' failed.")
+        if tweet_index is not None:
+            tweet_index.commit()
+        return processed_file_name
+
+    def extract_query(self, query):
+        """Scrapes one query into its own raw file and returns its key."""
+        if query is None:
+            return self.twitter_data_extraction()
+        self.raw_file_name = self.construct_filename(query)
+        try:
+            raw_df = self.scrape_query(query)
+            if raw_df is None or raw_df.empty:
+                logging.info(f"No tweets found for '{query}'.")
+                return None
+            if not self.upload_data(raw_df):
+                raise RuntimeError(f"Upload of {self.raw_file_name} failed.")
+            return self.raw_file_name
+        finally:
+            self.export_metrics()
+
+    def micro_batch_extraction(self, query=None):
+        """
+        Scrapes a query and scores its tweets while the page is still being
+        scrolled. Every scroll round goes through a bounded queue to a
+        consumer thread that writes a processed file each micro_batch_rows
+        rows or micro_batch_seconds seconds; the scraper waits while the
+        queue is full. No raw file is written. Returns the processed file names.
+        """
+        query = query or self.query
+        raw_file_name = self.construct_filename(query)
+        batches = queue.Queue(maxsize=self.micro_batch_queue_size)
+        state = {'files': [], 'error': None}
+        consumer = threading.Thread(
+            target=self.consume_micro_batches, args=(batches, raw_file_name, state),
+            name='micro-batch-consumer', daemon=True)
+        consumer.start()
+        try:
+            try:
+                self.scrape_query(
+                    query, on_batch=lambda tweets: self.put_micro_batch(batches, tweets, consumer))
+            except Exception:
+                # A failed consumer stops the scraper; report the consumer's error.
+                if state['error'] is None:
+                    raise
+            finally:
+                if consumer.is_alive():
+                    self.put_micro_batch(batches, None, consumer)
+                consumer.join()
+            if state['error'] is not None:
+                raise state['error']
+            logging.info(
+                f"Micro-batch extraction wrote {len(state['files'])} files; the scraper "
+                f"waited {self.micro_batch_wait:.1f}s on a full queue.")
+            return state['files']
+        finally:
+            self.export_metrics()
+
+    def put_micro_batch(self, batches, tweets, consumer):
+        """Queues a round of tweets, blocking while the queue is full."""
+        start = time.perf_counter()
+        while True:
+            try:
+                batches.put(tweets, timeout=1)
+                break
+            except queue.Full:
+                if not consumer.is_alive():
+                    raise RuntimeError("The micro-batch consumer stopped.")
+        self.micro_batch_wait += time.perf_counter() - start
+
+    def consume_micro_batches(self, batches, raw_file_name, state):
+        """Scores queued tweets and flushes them until the None end marker."""
+        analyzer = self.create_analyzer(pd.DataFrame())
+        tweet_index = self.create_tweet_index(raw_file_name)
+        seen = SeenKeys()
+        buffer = []
+        deadline = time.monotonic() + self.micro_batch_seconds
+        try:
+            while True:
+                try:
+                    tweets = batches.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    tweets = []
+                if tweets is None:
+                    break
+                buffer += tweets
+                if len(buffer) >= self.micro_batch_rows or time.monotonic() >= deadline:
+                    self.flush_micro_batch(buffer, raw_file_name, analyzer, seen,
+                                           tweet_index, state['files'])
+                    buffer = []
+                    deadline = time.monotonic() + self.micro_batch_seconds
+            self.flush_micro_batch(buffer, raw_file_name, analyzer, seen,
+                                   tweet_index, state['files'])
+        except Exception as e:
+            logging.error(f"An error occurred while processing a micro-batch: {e}")
+            state['error'] = e
+        finally:
+            self.close_analyzer(analyzer)
+
+    def flush_micro_batch(self, tweets, raw_file_name, analyzer, seen, tweet_index, files):
+        """Scores one micro-batch and uploads it as the next part file."""
+        if not tweets:
+            return
+        with recorder.stage('micro_batch', rows=len(tweets)):
+            processed_df = self.process_data(pd.DataFrame(tweets), analyzer, seen, tweet_index)
+            if processed_df.empty:
+                return
+            stem, dot, extension = raw_file_name.rpartition('.')
+            part_name = f"{stem}_part{len(files):05d}{dot}{extension}"
+            processed_file_name = self.upload_processed_data(processed_df, part_name)
+            if processed_file_name is None:
+                raise RuntimeError(f"Upload of micro-batch {part_name} failed.")
+            if tweet_index is not None:
+                tweet_index.commit()
+            files.append(processed_file_name)
+        logging.info(f"Micro-batch {processed_file_name}: {len(tweets)} tweets in, "
+                     f"{len(processed_df)} rows out.")
 
     def scrape_data(self):
-        scraper = TwitterScraper(self.query, self.auth_token)
-        scraper.login_and_search()
-        raw_df = scraper.scroll_and_scrap()
-        logging.info("Data scraped successfully.")
+        with recorder.stage('scrape_data') as stage:
+            if self.shard_hours is not None:
+                raw_df = self.scrape_shards()
+            else:
+                raw_df = self.scrape_query(self.query)
+                logging.info("Data scraped successfully.")
+            stage.rows = 0 if raw_df is None else len(raw_df)
         return raw_df
 
-    def upload_data(self, raw_df):
-        if raw_df is not None:
-            self.aws.upload_to_s3(
-                raw_df, self.raw_file_name, self.raw_data_bucket_name)
-            logging.info("Data uploaded to S3 successfully.")
+    def get_driver_pool(self):
+        """Returns the warm browser pool, creating it on first use."""
+        if not self.warm_drivers:
+            return None
+        if self.driver_pool is None:
+            with self.driver_pool_lock:
+                if self.driver_pool is None:
+                    from scraper import DriverPool
+                    driver_options = {name: self.scraper_options[name]
+                                      for name in ('width', 'height', 'block_css')
+                                      if name in self.scraper_options}
+                    self.driver_pool = DriverPool(
+                        self.scrape_pool_size,
+                        headless=self.scraper_options.get('headless', True),
+                        **driver_options)
+        return self.driver_pool
+
+    def scrape_query(self, query, on_batch=None):
+        from scraper import TwitterScraper
+        scraper = TwitterScraper(query, self.auth_token,
+                                 driver_pool=self.get_driver_pool(),
+                                 on_batch=on_batch, **self.scraper_options)
+        try:
+            with recorder.stage('scrape_query') as stage:
+                scraper.login_and_search()
+                raw_df = scraper.scroll_and_scrap()
+                stage.rows = 0 if raw_df is None else len(raw_df)
+            return raw_df
+        finally:
+            self.scrape_timings.append({'query': query, **scraper.timings})
+
+    def scrape_shard(self, query):
+        """Scrapes one time slice, retrying it up to shard_retries times."""
+        for attempt in range(self.shard_retries + 1):
+            try:
+                return self.scrape_query(query)
+            except Exception as e:
+                if attempt == self.shard_retries:
+                    logging.error(f"Shard '{query}' failed: {e}")
+                    raise
+                logging.warning(
+                    f"Shard '{query}' failed on attempt {attempt + 1}, retrying: {e}")
 
-    def twitter_data_transformation(self):
+    def scrape_shards(self, keyword=None, window=None):
+        """
+        Scrapes the time slices of the window in parallel, each in its own
+        browser with at most scrape_pool_size browsers open, and merges the
+        results without cross-shard duplicates.
+        """
+        queries = self.construct_shard_queries(keyword, window)
+        logging.info(
+            f"Scraping {len(queries)} shards with {self.scrape_pool_size} browsers.")
+        with ThreadPoolExecutor(max_workers=self.scrape_pool_size) as executor:
+            frames = list(executor.map(self.scrape_shard, queries))
+        frames = [df for df in frames if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        raw_df = DataProcessor(pd.concat(frames, ignore_index=True)).remove_duplicates().df
+        logging.info(f"Data scraped successfully from {len(queries)} shards.")
+        return raw_df
+
+    def upload_data(self, raw_df, raw_file_name=None):
+        """Uploads the raw data and returns whether the upload succeeded."""
+        raw_file_name = raw_file_name or self.raw_file_name
+        if raw_df is None:
+            return False
+        if self.output_format == 'parquet':
+            raw_df = DataProcessor(raw_df).apply_schema().df
+        if not self.aws.upload_to_s3(
+                raw_df, raw_file_name, self.raw_data_bucket_name):
+            return False
+        logging.info("Data uploaded to S3 successfully.")
+        return True
+
+    def twitter_data_transformation(self, raw_file_name=None):
+        """
+        Transforms the raw file written by the extraction step and returns
+        the processed file name.
+        """
         try:
+            if raw_file_name is not None:
+                self.raw_file_name = raw_file_name
+            elif self.incremental:
+                logging.info("No new raw file to transform.")
+                return None
+            if self.stream_chunk_size is not None:
+                return self.stream_data_transformation()
             raw_df = self.download_data()
-            processed_df = self.process_data(raw_df)
-            self.upload_processed_data(processed_df)
+            tweet_index = self.create_tweet_index(self.raw_file_name)
+            processed_df = self.process_data(raw_df, tweet_index=tweet_index)
+            processed_file_name = self.upload_processed_data(processed_df)
+            if processed_file_name is None:
+                raise RuntimeError(f"Upload of the processed {self.raw_file_name} failed.")
+            if tweet_index is not None:
+                tweet_index.commit()
+            return processed_file_name
         except Exception as e:
             logging.error(
                 f"An error occurred during transformation process: {e}")
             raise
+        finally:
+            self.export_metrics()
 
     def download_data(self):
-        raw_df = self.aws.download_from_s3(
-            self.raw_data_bucket_name, self.raw_file_name)
+        with recorder.stage('download_data') as stage:
+            raw_df = self.aws.download_from_s3(
+                self.raw_data_bucket_name, self.raw_file_name, DataProcessor.RAW_DTYPES)
+            stage.rows = len(raw_df)
         logging.info("Data downloaded from S3 successfully.")
         return raw_df
 
-    def process_data(self, raw_df):
+    def create_tweet_index(self, raw_file_name):
+        """
+        Returns the index of already processed tweets, kept per keyword so a
+        tweet mentioning two keywords is loaded once for each of them.
+        """
+        if self.tweet_index_path is None:
+            return None
+        path = self.tweet_index_path
+        if raw_file_name.startswith('keyword='):
+            path = f"{path}/{raw_file_name.split('/', 1)[0]}"
+        from tweet_index import TweetIndex
+        return TweetIndex(path, self.aws, self.tweet_index_retention_days)
+
+    def create_analyzer(self, df):
+        from analyzer import SentimentAnalyzer
+        return SentimentAnalyzer(df, cache_path=self.sentiment_cache_path)
+
+    def close_analyzer(self, analyzer):
+        if analyzer.cache is not None:
+            analyzer.cache.log_stats()
+            analyzer.cache.close()
+
+    def process_data(self, raw_df, analyzer=None, seen=None, tweet_index=None):
         if raw_df is not None:
-            process = DataProcessor(raw_df)
-            process.remove_duplicates()
+            process = DataProcessor(raw_df, lean=self.lean_processing)
+            process.remove_duplicates(seen)
+            if tweet_index is not None:
+                # Drop the tweets an earlier run already wrote.
+                tweet_index.filter_new(process.df)
+            if self.lean_processing:
+                process.compact()
             # process.convert_utc_to_ist('created_at') 
-            analyzer = SentimentAnalyzer(process.df)
-            processed_df = analyzer.analyze()
+            if analyzer is None:
+                shared_analyzer = False
+                analyzer = self.create_analyzer(process.df)
+            else:
+                shared_analyzer = True
+                analyzer.df = process.df
+            processed_df = analyzer.analyze(
+                batch=True, workers=self.sentiment_workers,
+                categorical=self.lean_processing)
             process.delete_column('text')
-            process.delete_column('scores')
+            if not shared_analyzer:
+                self.close_analyzer(analyzer)
             logging.info("Data processed successfully.")
             return processed_df
 
-    def upload_processed_data(self, processed_df):
-        analyzed_file_name = f"analyzed_{self.raw_file_name}"
-        self.aws.upload_to_s3(processed_df, analyzed_file_name,
-                              self.processed_data_bucket_name)
-        logging.info("Processed data uploaded to S3 successfully.")
\ No newline at end of file
+    def stream_data_transformation(self):
+        """
+        Downloads, processes and uploads the raw file chunk by chunk, so peak
+        memory depends on stream_chunk_size rather than on the file size,
+        apart from the 8-byte hash kept per row for cross-chunk duplicates.
+        """
+        analyzed_file_name = self.construct_processed_filename(self.raw_file_name)
+        analyzer = self.create_analyzer(pd.DataFrame())
+        tweet_index = self.create_tweet_index(self.raw_file_name)
+        seen = SeenKeys()
+        rollup_frames = []
+        try:
+            with self.aws.open_s3_writer(self.processed_data_bucket_name,
+                                         analyzed_file_name) as writer:
+                chunks = self.aws.stream_from_s3(
+                    self.raw_data_bucket_name, self.raw_file_name,
+                    self.stream_chunk_size, DataProcessor.RAW_DTYPES)
+                for number, raw_df in enumerate(chunks):
+                    processed_df = self.process_data(raw_df, analyzer, seen, tweet_index)
+                    writer.write_df(processed_df, header=number == 0)
+                    if self.rollups:
+                        rollup_frames.append(build_rollups(processed_df))
+                    logging.info(
+                        f"Chunk {number}: {len(raw_df)} rows in, {len(processed_df)} rows out.")
+        finally:
+            self.close_analyzer(analyzer)
+        if self.rollups and not self.upload_rollups(merge_rollups(rollup_frames)):
+            raise RuntimeError(f"Upload of the rollup of {analyzed_file_name} failed.")
+        if tweet_index is not None:
+            tweet_index.commit()
+        logging.info("Processed data streamed to S3 successfully.")
+        return analyzed_file_name
+
+    def upload_processed_data(self, processed_df, raw_file_name=None):
+        raw_file_name = raw_file_name or self.raw_file_name
+        # Rolled up before the schema is applied, in the same pass as the upload.
+        rollup_df = build_rollups(processed_df) if self.rollups else None
+        if self.output_format == 'parquet':
+            processed_df = DataProcessor(processed_df).apply_schema().df
+        analyzed_file_name = self.construct_processed_filename(raw_file_name)
+        if not self.aws.upload_to_s3(processed_df, analyzed_file_name,
+                                     self.processed_data_bucket_name):
+            return None
+        logging.info("Processed data uploaded to S3 successfully.")
+        if rollup_df is not None and not self.upload_rollups(rollup_df, raw_file_name):
+            return None
+        return analyzed_file_name
+
+    def upload_rollups(self, rollup_df, raw_file_name=None):
+        """
+        Uploads the sentiment rollups of a processed file. The Lambda loads
+        them into the summary table, so dashboards read buckets, not tweets.
+        """
+        rollup_file_name = self.construct_rollup_filename(raw_file_name or self.raw_file_name)
+        # Reloads of the file replace its rows in the summary table.
+        rollup_df = rollup_df.assign(**{redshift_sql.ROLLUP_SOURCE: rollup_file_name})[
+            [redshift_sql.ROLLUP_SOURCE] + ROLLUP_COLUMNS]
+        if not self.aws.upload_to_s3(rollup_df, rollup_file_name,
+                                     self.processed_data_bucket_name):
+            return False
+        logging.info(f"{len(rollup_df)} rollup rows uploaded to {rollup_file_name}.")
+        return True
+
+    def load_processed_data(self, processed_file_name, conn, table=redshift_sql.TABLE,
+                            rollup_table=redshift_sql.ROLLUP_TABLE):
+        """
+        Copies a processed file into Redshift over an open connection with
+        the same SQL as the Lambda. With rollups on, the file's rollup
+        replaces its rows in the summary table in the same transaction.
+        """
+        keyword = redshift_sql.get_keyword(processed_file_name)
+        credentials = redshift_sql.credentials(self.aws_key, self.aws_secret)
+        with conn.cursor() as cur:
+            redshift_sql.copy_into(
+                cur, f"s3://{self.processed_data_bucket_name}/{processed_file_name}",
+                redshift_sql.get_copy_format(processed_file_name), keyword, credentials,
+                table=table)
+            if self.rollups:
+                path, _, name = processed_file_name.rpartition('/')
+                raw_file_name = f"{path}/{name[len('analyzed_'):]}" if path else name[len('analyzed_'):]
+                rollup_file_name = self.construct_rollup_filename(raw_file_name)
+                redshift_sql.load_rollup(
+                    cur, f"s3://{self.processed_data_bucket_name}/{rollup_file_name}",
+                    redshift_sql.get_copy_format(rollup_file_name), keyword, credentials,
+                    rollup_table)
+        conn.commit()
+        logging.info(f"Data from {processed_file_name} loaded successfully into Redshift.")
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import socket
+import logging
+import resource
+import threading
+from datetime import datetime, timezone
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MiB."""
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Stage:
+    """Measures one run of a stage; callers may set rows and bytes."""
+
+    def __init__(self, recorder, name, rows=None, bytes=None):
+        self.recorder = recorder
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+
+    def __enter__(self):
+        self.start_peak = peak_rss_mb()
+        self.start_cpu = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self.start
+        # CPU time is process wide, so concurrent stages include each other.
+        cpu = time.process_time() - self.start_cpu
+        peak = peak_rss_mb()
+        self.recorder.add(self.name, wall, cpu, peak, peak - self.start_peak,
+                          self.rows, self.bytes, exc_type is not None)
+        return False
+
+
+class NullStage:
+    """Stage used while instrumentation is disabled; it records nothing."""
+    rows = None
+    bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class MetricsRecorder:
+    """
+    Aggregates wall time, CPU time, peak RSS, rows and bytes per stage and
+    exports them as a JSON run report, StatsD timings or a Prometheus
+    textfile. Disabled recorders hand out one shared no-op stage.
+    """
+
+    def __init__(self, enabled=False, prefix='twitter_etl'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc)
+
+    def enable(self):
+        self.enabled = True
+
+    def stage(self, name, rows=None, bytes=None):
+        """Returns a context manager that measures one run of `name`."""
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, rows, bytes)
+
+    def add(self, name, wall, cpu, peak, peak_growth, rows, bytes, failed):
+        with self.lock:
+            totals = self.stages.setdefault(name, {
+                'calls': 0, 'failures': 0, 'wall_seconds': 0.0,
+                'cpu_seconds': 0.0, 'max_wall_seconds': 0.0, 'rows': 0,
+                'bytes': 0, 'peak_rss_mb': 0.0, 'peak_rss_growth_mb': 0.0})
+            totals['calls'] += 1
+            totals['failures'] += int(failed)
+            totals['wall_seconds'] += wall
+            totals['cpu_seconds'] += cpu
+            totals['max_wall_seconds'] = max(totals['max_wall_seconds'], wall)
+            totals['rows'] += rows or 0
+            totals['bytes'] += bytes or 0
+            totals['peak_rss_mb'] = max(totals['peak_rss_mb'], peak)
+            totals['peak_rss_growth_mb'] = max(totals['peak_rss_growth_mb'], peak_growth)
+
+    def report(self):
+        """Returns the run report as a dict."""
+        with self.lock:
+            stages = {name: dict(totals) for name, totals in self.stages.items()}
+        return {
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'pid': os.getpid(),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages,
+        }
+
+    def write_report(self, path):
+        """Writes the run report as JSON."""
+        report = self.report()
+        write_atomic(path, json.dumps(report, indent=2))
+        logging.info(f"Run report written to {path}.")
+        return report
+
+    def push_statsd(self, address):
+        """Sends stage totals as StatsD timings and counters over UDP."""
+        host, port = address.rsplit(':', 1)
+        lines = []
+        for name, totals in self.report()['stages'].items():
+            key = f"{self.prefix}.{name}"
+            lines.append(f"{key}.wall:{totals['wall_seconds'] * 1000:.3f}|ms")
+            lines.append(f"{key}.cpu:{totals['cpu_seconds'] * 1000:.3f}|ms")
+            lines.append(f"{key}.rows:{totals['rows']}|c")
+            lines.append(f"{key}.bytes:{totals['bytes']}|c")
+            lines.append(f"{key}.peak_rss_mb:{totals['peak_rss_mb']:.1f}|g")
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for line in lines:
+                sock.sendto(line.encode(), (host, int(port)))
+        logging.info(f"Pushed {len(lines)} metrics to StatsD at {address}.")
+
+    def write_textfile(self, path):
+        """Writes stage totals in the Prometheus textfile collector format."""
+        fields = ['calls', 'failures', 'wall_seconds', 'cpu_seconds',
+                  'max_wall_seconds', 'rows', 'bytes', 'peak_rss_mb']
+        stages = self.report()['stages']
+        lines = []
+        for field in fields:
+            metric = f"{self.prefix}_stage_{field}"
+            lines.append(f"# TYPE {metric} gauge")
+            for name, totals in stages.items():
+                lines.append(f'{metric}{{stage="{name}"}} {totals[field]}')
+        write_atomic(path, "\n".join(lines) + "\n")
+        logging.info(f"Prometheus metrics written to {path}.")
+
+
+def write_atomic(path, text):
+    """Writes a file through a temporary file so readers never see half of it."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+# Process-wide recorder used by every stage; disabled until enabled.
+recorder = MetricsRecorder()
@@ -0,0 +1,86 @@
+import re
+
+
+# Shared by main.py (DAG loads) and lambda.py; ship this file in the Lambda
+# deployment package. It must not import pandas or boto3.
+TABLE = 'public.zomato_data'
+# Columns of the processed files, in file order; keyword comes from the key.
+COLUMNS = '"user", username, created_at, like_count, reply_count, retweet_count, views_count, compound, sentiment'
+# The processed files carry no text, so a tweet is identified by these.
+MERGE_KEY = ['"user"', 'username', 'created_at']
+KEYWORD_PATTERN = re.compile(r'(?:^|/)keyword=([^/]+)/')
+# Sentiment rollups written next to the processed files are loaded into
+# this summary table instead of TABLE, one row set per rollup file.
+ROLLUP_TABLE = 'public.zomato_sentiment_rollup'
+ROLLUP_PREFIX = 'rollup_'
+# First column of every rollup file: the key of the file itself.
+ROLLUP_SOURCE = 'source_file'
+ROLLUP_KEY = ['grain', 'bucket_start', 'username', 'sentiment']
+ROLLUP_MEASURES = ['tweets', 'compound_sum', 'like_count', 'reply_count', 'retweet_count',
+                   'views_count', 'engagement', 'engagement_compound_sum', 'views_compound_sum']
+
+
+def get_copy_format(file_name):
+    if file_name.endswith('.parquet'):
+        return "FORMAT AS PARQUET"
+    return "CSV DELIMITER ',' IGNOREHEADER 1"
+
+def get_keyword(file_name):
+    """Returns the keyword of a keyword=... partitioned key, or None."""
+    match = KEYWORD_PATTERN.search(file_name)
+    return match.group(1) if match else None
+
+def is_rollup(file_name):
+    return file_name.rpartition('/')[2].startswith(ROLLUP_PREFIX)
+
+def credentials(access_key, secret_key):
+    return f"CREDENTIALS 'aws_access_key_id={access_key};aws_secret_access_key={secret_key}'"
+
+def copy_query(from_path, copy_format, credentials, table=TABLE, columns=COLUMNS):
+    return f"COPY {table} ({columns}) FROM '{from_path}' {credentials} {copy_format};"
+
+def load_rollup(cur, from_path, copy_format, keyword, credentials, rollup_table=ROLLUP_TABLE):
+    """
+    Replaces the rows of the staged rollup files in the summary table, so
+    reloading a file (a retry, a redelivered event or a DAG and Lambda load
+    of the same file) does not count it twice. Readers SUM the rows of a
+    bucket across source files.
+    """
+    columns = ', '.join([ROLLUP_SOURCE] + ROLLUP_KEY + ROLLUP_MEASURES)
+    keys = ', '.join([ROLLUP_SOURCE] + ROLLUP_KEY)
+    sums = ', '.join(f"SUM({measure})" for measure in ROLLUP_MEASURES)
+    cur.execute(f"CREATE TEMP TABLE rollup_staging (LIKE {rollup_table});")
+    cur.execute(copy_query(from_path, copy_format, credentials, table='rollup_staging',
+                           columns=columns))
+    cur.execute(f"DELETE FROM {rollup_table} WHERE {ROLLUP_SOURCE} IN "
+                f"(SELECT DISTINCT {ROLLUP_SOURCE} FROM rollup_staging);")
+    cur.execute(f"INSERT INTO {rollup_table} ({columns}, keyword) "
+                f"SELECT {keys}, {sums}, %s FROM rollup_staging GROUP BY {keys};", (keyword,))
+    cur.execute("DROP TABLE rollup_staging;")
+
+def copy_into(cur, from_path, copy_format, keyword, credentials, merge=False, table=TABLE):
+    """
+    Copies into the table. Files of a keyword partition, and every file in
+    merge mode, go through a staging table: keyword rows get the keyword
+    from the key, and in merge mode the rows already in the table are
+    deleted in the same transaction before the distinct staged rows are
+    inserted, so retries and re-runs do not duplicate them.
+    """
+    if keyword is None and not merge:
+        cur.execute(copy_query(from_path, copy_format, credentials, table=table))
+        return
+    cur.execute(f"CREATE TEMP TABLE load_staging (LIKE {table});")
+    cur.execute(copy_query(from_path, copy_format, credentials, table='load_staging'))
+    if merge:
+        matches = " AND ".join(f"{table}.{column} = load_staging.{column}"
+                               for column in MERGE_KEY)
+        if keyword is None:
+            cur.execute(f"DELETE FROM {table} USING load_staging "
+                        f"WHERE {matches} AND {table}.keyword IS NULL;")
+        else:
+            cur.execute(f"DELETE FROM {table} USING load_staging "
+                        f"WHERE {matches} AND {table}.keyword = %s;", (keyword,))
+    select = "SELECT DISTINCT" if merge else "SELECT"
+    cur.execute(f"INSERT INTO {table} ({COLUMNS}, keyword) "
+                f"{select} {COLUMNS}, %s FROM load_staging;", (keyword,))
+    cur.execute("DROP TABLE load_staging;")
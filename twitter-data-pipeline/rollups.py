@@ -0,0 +1,56 @@
+import logging
+import pandas as pd
+from redshift_sql import ROLLUP_KEY, ROLLUP_MEASURES
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+
+# 'hour' rows are keyed by hour and sentiment; 'user_day' rows by day,
+# username and sentiment. The columns are those of the summary table.
+KEY_COLUMNS = ROLLUP_KEY
+COUNT_COLUMNS = ['like_count', 'reply_count', 'retweet_count', 'views_count']
+# Only counts and sums, so rollups of separate batches merge by addition.
+# Engagement is likes plus retweets; weighted means are the weighted sums
+# divided by engagement or views_count.
+MEASURE_COLUMNS = ROLLUP_MEASURES
+COLUMNS = KEY_COLUMNS + MEASURE_COLUMNS
+
+
+def build_rollups(df):
+    """
+    Returns the hourly and per-user daily sentiment rollups of an analyzed
+    frame, in UTC. Rows without a parseable created_at are left out.
+    """
+    created_at = pd.to_datetime(df['created_at'], errors='coerce', utc=True).dt.tz_localize(None)
+    compound = df['compound'].astype('float64')
+    measures = pd.DataFrame({'tweets': 1, 'compound_sum': compound}, index=df.index)
+    for column in COUNT_COLUMNS:
+        measures[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+    measures['engagement'] = measures['like_count'] + measures['retweet_count']
+    measures['engagement_compound_sum'] = compound * measures['engagement']
+    measures['views_compound_sum'] = compound * measures['views_count']
+    measures['sentiment'] = df['sentiment'].astype(str)
+
+    hourly = measures.assign(bucket_start=created_at.dt.floor('h')).groupby(
+        ['bucket_start', 'sentiment'], observed=True)[MEASURE_COLUMNS].sum().reset_index()
+    hourly['grain'] = 'hour'
+    hourly['username'] = None
+
+    users = measures.assign(bucket_start=created_at.dt.floor('D'),
+                            username=df['username'].astype(str)).groupby(
+        ['bucket_start', 'username', 'sentiment'], observed=True)[MEASURE_COLUMNS].sum().reset_index()
+    users['grain'] = 'user_day'
+    rollup = pd.concat([hourly, users], ignore_index=True)[COLUMNS]
+    rollup['bucket_start'] = rollup['bucket_start'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return rollup
+
+
+def merge_rollups(frames):
+    """Adds up rollups of several batches into one rollup."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    merged = pd.concat(frames, ignore_index=True).groupby(
+        KEY_COLUMNS, dropna=False)[MEASURE_COLUMNS].sum().reset_index()
+    return merged[COLUMNS]
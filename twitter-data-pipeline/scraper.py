@@ -1,7 +1,12 @@
+import re
 import time
+import atexit
 import random
+import threading
+import hashlib
 import logging
 import pandas as pd
+from metrics import recorder
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
@@ -20,62 +25,284 @@ USERNAME_CSS = ".css-1dbjc4n.r-18u37iz.r-1wbh5a2.r-13hce6t"
 TEXT_CSS = ".css-901oao.r-1nao33i.r-37j5jr.r-a023e6.r-16dba41.r-rjixqe.r-bcqeeo.r-bnwqim.r-qvutc0"
 DATE_CSS = ".css-1dbjc4n.r-18u37iz.r-1wbh5a2.r-13hce6t"
 COUNT_CSS = ".css-1dbjc4n.r-1kbdv8c.r-18u37iz.r-1wtj0ep.r-1s2bzr4.r-hzcoqn"
+NAME_CSS = ".css-901oao.css-16my406.r-poiln3.r-bcqeeo.r-qvutc0"
+STATUS_ID_PATTERN = re.compile(r"/status/(\d+)")
+
+# Resources the scraper never reads; blocked through the DevTools protocol.
+BLOCKED_URLS = ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+                '*.woff', '*.woff2', '*.ttf', '*.otf', '*.mp4', '*.m3u8', '*.webm',
+                '*video.twimg.com*', '*pbs.twimg.com/media*']
+# Stylesheets are optional: lazy loading depends on layout, so only block
+# them when the page still loads new articles without them.
+CSS_URLS = ['*.css']
+# Flags that cut Chrome's startup work in headless sessions.
+FAST_START_ARGS = ['--disable-gpu', '--disable-extensions', '--disable-dev-shm-usage',
+                   '--no-first-run', '--no-default-browser-check', '--mute-audio',
+                   '--disable-background-networking', '--disable-sync']
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537"
+
+# Returns the number of loaded articles and the last one.
+ARTICLE_STATE_JS = """
+const articles = document.querySelectorAll(arguments[0]);
+return [articles.length, articles.length ? articles[articles.length - 1] : null];
+"""
+
+# Reads every article in one round trip and returns plain records.
+EXTRACT_TWEETS_JS = """
+const [articleCss, userCss, usernameCss, nameCss, textCss, dateCss, countCss] = arguments;
+const text = (node) => node ? node.innerText : null;
+return Array.from(document.querySelectorAll(articleCss), (article) => {
+    const user = article.querySelector(userCss);
+    const username = article.querySelector(usernameCss);
+    const date = article.querySelector(dateCss);
+    const time = date ? date.querySelector('time') : null;
+    const counts = article.querySelector(countCss);
+    const link = time ? time.closest('a') : null;
+    return {
+        status_url: link ? link.getAttribute('href') : null,
+        user: user ? text(user.querySelector(nameCss)) : null,
+        username: username ? text(username.querySelector(nameCss)) : null,
+        text: text(article.querySelector(textCss)),
+        created_at: time ? time.getAttribute('datetime') : null,
+        counts: counts ? counts.getAttribute('aria-label') : null,
+    };
+});
+"""
+
+
+def build_driver(width=1920, height=1080, headless=False, block_css=False):
+    """Starts a Chrome session that skips images, fonts and media."""
+    options = Options()
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    if headless:
+        options.add_argument('--headless=new')
+        for argument in FAST_START_ARGS:
+            options.add_argument(argument)
+    # Return from get() once the DOM is parsed; articles are waited for explicitly.
+    options.page_load_strategy = 'eager'
+
+    # Setting a common user-agent
+    options.add_argument(f"user-agent={USER_AGENT}")
+
+    driver = webdriver.Chrome(options=options)
+    driver.set_window_size(width, height)
+    blocked = BLOCKED_URLS + (CSS_URLS if block_css else [])
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked})
+    return driver
+
+
+class DriverPool:
+    """
+    Keeps logged-in WebDriver sessions warm so consecutive queries and shards
+    skip Chrome startup and the login round trip. At most `max_size`
+    sessions are handed out at once; idle sessions are checked before reuse.
+    """
+
+    def __init__(self, max_size=4, **driver_options):
+        self.max_size = max_size
+        # Passed to build_driver, eg:- {'headless': True, 'block_css': False}
+        self.driver_options = driver_options
+        self.idle = []
+        self.logged_in = set()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.created = 0
+        self.reused = 0
+        atexit.register(self.close)
+
+    def acquire(self):
+        """Returns an idle healthy session, or starts a new one."""
+        self.slots.acquire()
+        try:
+            while True:
+                with self.lock:
+                    driver = self.idle.pop() if self.idle else None
+                if driver is None:
+                    driver = build_driver(**self.driver_options)
+                    with self.lock:
+                        self.created += 1
+                    return driver
+                if self.is_alive(driver):
+                    with self.lock:
+                        self.reused += 1
+                    return driver
+                logging.warning("Discarding a pooled WebDriver session that stopped responding.")
+                self.quit(driver)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, driver):
+        """Returns a session to the pool for the next query."""
+        with self.lock:
+            self.idle.append(driver)
+        self.slots.release()
+
+    def discard(self, driver):
+        """Quits a session that should not be reused."""
+        self.quit(driver)
+        self.slots.release()
+
+    def is_alive(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def quit(self, driver):
+        with self.lock:
+            self.logged_in.discard(driver.session_id)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Failed to quit a WebDriver session: {e}")
+
+    def is_logged_in(self, driver):
+        return driver.session_id in self.logged_in
+
+    def mark_logged_in(self, driver):
+        with self.lock:
+            self.logged_in.add(driver.session_id)
+
+    def stats(self):
+        """Returns how many sessions were started and how often they were reused."""
+        return {'created': self.created, 'reused': self.reused}
+
+    def close(self):
+        """Quits every idle session."""
+        with self.lock:
+            drivers, self.idle = self.idle, []
+        for driver in drivers:
+            self.quit(driver)
 
 
 class TwitterScraper:
-    def __init__(self, query, auth_token, width=1920, height=1080):
+    def __init__(self, query, auth_token, width=1920, height=1080,
+                 batch_extraction=True, headless=False, max_idle_rounds=3,
+                 adaptive_scroll=True, scroll_wait=2, max_scroll_wait=16,
+                 poll_frequency=0.2, jitter=0, base_url='https://twitter.com',
+                 block_css=False, driver_pool=None, on_batch=None):
         self.query = query
         self.auth_token = auth_token
         self.width = width
         self.height = height
+        self.headless = headless
+        # Extract all articles with one execute_script call per round.
+        self.batch_extraction = batch_extraction
+        # Stop scrolling after this many rounds without a new tweet.
+        self.max_idle_rounds = max_idle_rounds
+        # Status links of the tweets returned by the last batch extraction.
+        self.status_urls = []
+        # Wait for new articles instead of sleeping a fixed 3-7s per round.
+        self.adaptive_scroll = adaptive_scroll
+        # Initial wait per round, doubled while loading stalls up to the ceiling.
+        self.scroll_wait = scroll_wait
+        self.max_scroll_wait = max_scroll_wait
+        self.poll_frequency = poll_frequency
+        # Upper bound of a random extra pause per round, in seconds.
+        self.jitter = jitter
+        self.round_stats = []
+        # Site to search, eg:- a local fixture server in benchmarks.
+        self.base_url = base_url
+        self.block_css = block_css
+        # Shared DriverPool; sessions are returned to it instead of quit.
+        self.driver_pool = driver_pool
+        # Called with the new tweets of every round instead of keeping them,
+        # eg:- to feed a queue; it may block to slow the scraper down.
+        self.on_batch = on_batch
+        # Seconds spent starting the driver, reaching the first article and scrolling.
+        self.timings = {}
         self.df = None
         self.driver = None
         self.file_name = None
         self.create_driver()
         
     def create_driver(self):
-        """Initializes the selenium webdriver."""
+        """Initializes the selenium webdriver, from the pool when one is set."""
+        start = time.perf_counter()
         try:
-            options = Options()
-            options.add_argument('--blink-settings=imagesEnabled=false')
-            # options.add_argument('--headless')
-            
-            # Setting a common user-agent
-            options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537")
-            
-            driver = webdriver.Chrome(options=options)
-            driver.set_window_size(self.width, self.height)
-            self.driver = driver
-            logging.info("WebDriver initialized successfully.")
+            if self.driver_pool is not None:
+                self.driver = self.driver_pool.acquire()
+            else:
+                self.driver = build_driver(self.width, self.height,
+                                           self.headless, self.block_css)
+            self.timings['driver_startup'] = time.perf_counter() - start
+            logging.info(
+                f"WebDriver initialized successfully in {self.timings['driver_startup']:.2f}s.")
         except Exception as e:
             logging.error("WebDriver failed to initialize.")            
             self.driver = None
             raise e
 
+    def close_driver(self, reusable=True):
+        """Returns the driver to the pool, or quits it when there is none."""
+        if self.driver is None:
+            return
+        if self.driver_pool is None:
+            self.driver.quit()
+        elif reusable:
+            self.driver_pool.release(self.driver)
+        else:
+            self.driver_pool.discard(self.driver)
+        self.driver = None
+
     def login_and_search(self):
         """Login into Twitter and performs search."""
-        twitter_url = 'https://twitter.com/'
-        twitter_search_url = f'https://twitter.com/search?q={self.query}&src=typed_query&f=live'
+        twitter_url = f'{self.base_url}/'
+        twitter_search_url = f'{self.base_url}/search?q={self.query}&src=typed_query&f=live'
 
+        start = time.perf_counter()
         try:
-            self.driver.get(twitter_url)
-            self.driver.add_cookie({
-                'name': 'auth_token',
-                'value': self.auth_token
-            })
+            # Pooled sessions keep the auth cookie, so the login page is skipped.
+            if self.driver_pool is None or not self.driver_pool.is_logged_in(self.driver):
+                self.driver.get(twitter_url)
+                self.driver.add_cookie({
+                    'name': 'auth_token',
+                    'value': self.auth_token
+                })
+                if self.driver_pool is not None:
+                    self.driver_pool.mark_logged_in(self.driver)
             self.driver.get(twitter_search_url)
             WebDriverWait(self.driver, 100).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, ARTICLE_CSS)))
+            self.timings['time_to_first_article'] = time.perf_counter() - start
+            logging.info(
+                f"First article loaded in {self.timings['time_to_first_article']:.2f}s.")
         except TimeoutException:
             logging.error(f"Timed out waiting for element with selector {ARTICLE_CSS}.")
+            self.close_driver(reusable=False)
             raise
         except Exception as e:
             logging.error(
                 f"Error occurred while logging into Twitter and performing the search.")
-            self.driver.quit()
-            self.driver = None
+            self.close_driver(reusable=False)
             raise e
 
+    def parse_counts(self, aria_label):
+        """Parses the engagement counts from an aria-label."""
+        label = aria_label.split(", ")
+        count_data = {'replies': 0,
+                      'Retweets': 0,
+                      'likes': 0,
+                      'views': 0}
+        for item in label:
+            try:
+                item_split = item.split(" ")
+                count_data[item_split[1]] = int(item_split[0])
+            except ValueError as ve:
+                logging.error(
+                    f"Unable to convert count to integer: {ve}")
+            except Exception as e:
+                logging.error(
+                    f"An unknown error occurred when parsing counts: {e}")
+
+        return {'like_count': count_data['likes'],
+                'reply_count': count_data['replies'],
+                'retweet_count': count_data['Retweets'],
+                'views_count': count_data['views']}
+
     def scrap_tweets(self):
         """Scrapes tweets from the page."""
         tweets_data = []
@@ -86,13 +313,13 @@ class TwitterScraper:
                 tweet_data = {}
                 try:
                     user = article.find_element(By.CSS_SELECTOR, USER_CSS).find_element(
-                        By.CSS_SELECTOR, ".css-901oao.css-16my406.r-poiln3.r-bcqeeo.r-qvutc0").text.strip()
+                        By.CSS_SELECTOR, NAME_CSS).text.strip()
                     tweet_data['user'] = user
                 except NoSuchElementException:
                     pass
                 try:
                     username = article.find_element(By.CSS_SELECTOR, USERNAME_CSS).find_element(
-                        By.CSS_SELECTOR, ".css-901oao.css-16my406.r-poiln3.r-bcqeeo.r-qvutc0").text.strip()
+                        By.CSS_SELECTOR, NAME_CSS).text.strip()
                     tweet_data['username'] = username
                 except NoSuchElementException:
                     pass
@@ -110,26 +337,8 @@ class TwitterScraper:
                     pass
                 try:
                     counts = article.find_element(By.CSS_SELECTOR, COUNT_CSS)
-                    label = counts.get_attribute('aria-label').split(", ")
-                    count_data = {'replies': 0,
-                                  'Retweets': 0,
-                                  'likes': 0,
-                                  'views': 0}
-                    for item in label:
-                        try:
-                            item_split = item.split(" ")
-                            count_data[item_split[1]] = int(item_split[0])
-                        except ValueError as ve:
-                            logging.error(
-                                f"Unable to convert count to integer: {ve}")
-                        except Exception as e:
-                            logging.error(
-                                f"An unknown error occurred when parsing counts: {e}")
-
-                    tweet_data['like_count'] = count_data['likes']
-                    tweet_data['reply_count'] = count_data['replies']
-                    tweet_data['retweet_count'] = count_data['Retweets']
-                    tweet_data['views_count'] = count_data['views']
+                    tweet_data.update(
+                        self.parse_counts(counts.get_attribute('aria-label')))
                 except NoSuchElementException:
                     pass
 
@@ -141,37 +350,168 @@ class TwitterScraper:
             f"Number of tweets received this time: {len(tweets_data)}")
         return tweets_data
 
+    def scrap_tweets_batch(self):
+        """Scrapes tweets from the page with a single in-browser script."""
+        tweets_data = []
+        records = self.driver.execute_script(
+            EXTRACT_TWEETS_JS, ARTICLE_CSS, USER_CSS, USERNAME_CSS, NAME_CSS,
+            TEXT_CSS, DATE_CSS, COUNT_CSS) or []
+        self.status_urls = [record['status_url'] for record in records]
+        for record in records:
+            tweet_data = {}
+            if record['user'] is not None:
+                tweet_data['user'] = record['user'].strip()
+            if record['username'] is not None:
+                tweet_data['username'] = record['username'].strip()
+            if record['text'] is not None:
+                tweet_data['text'] = record['text'].strip().replace('\n', '')
+            if record['created_at'] is not None:
+                tweet_data['created_at'] = record['created_at']
+            if record['counts'] is not None:
+                tweet_data.update(self.parse_counts(record['counts']))
+            tweets_data.append(tweet_data)
+
+        logging.info(
+            f"Number of tweets received this time: {len(tweets_data)}")
+        return tweets_data
+
+    def tweet_identity(self, tweet, status_url=None):
+        """
+        Returns a stable identity for a tweet: its status ID when the link is
+        known, otherwise a hash of the user, timestamp and text.
+        """
+        if status_url:
+            match = STATUS_ID_PATTERN.search(status_url)
+            if match:
+                return f"id:{match.group(1)}"
+        key = "|".join(str(tweet.get(field)) for field in ['user', 'created_at', 'text'])
+        return f"hash:{hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()}"
+
+    def collect_new_tweets(self, seen):
+        """
+        Scrapes the visible tweets and returns only those not seen in earlier
+        rounds, adding their identities to `seen`.
+        """
+        if self.batch_extraction:
+            tweets = self.scrap_tweets_batch()
+            status_urls = self.status_urls
+        else:
+            tweets = self.scrap_tweets()
+            status_urls = [None] * len(tweets)
+
+        new_tweets = []
+        for tweet, status_url in zip(tweets, status_urls):
+            identity = self.tweet_identity(tweet, status_url)
+            if identity not in seen:
+                seen.add(identity)
+                new_tweets.append(tweet)
+        return new_tweets, len(tweets) - len(new_tweets)
+
+    def page_state(self):
+        """Returns the number of loaded articles and the last article."""
+        count, last = self.driver.execute_script(ARTICLE_STATE_JS, ARTICLE_CSS)
+        return count, last
+
+    def scroll_and_wait(self, timeout):
+        """
+        Scrolls to the bottom and waits until more articles are loaded or the
+        last article changes. Returns whether it did and the time waited.
+        """
+        state = self.page_state()
+        self.driver.execute_script(
+            "window.scrollTo(0, document.body.scrollHeight);")
+        start = time.perf_counter()
+        try:
+            WebDriverWait(self.driver, timeout,
+                          poll_frequency=self.poll_frequency).until(
+                lambda driver: self.page_state() != state)
+            loaded = True
+        except TimeoutException:
+            loaded = False
+        return loaded, time.perf_counter() - start
+
+    def hand_off(self, tweets, tweets_list):
+        """Passes a round's tweets to on_batch, or keeps them for the frame."""
+        if self.on_batch is None:
+            tweets_list += tweets
+        elif tweets:
+            self.on_batch(tweets)
+
     def scroll_and_scrap(self):
         """Scrolls through the page and scraps tweets."""
         tweets_list = []
+        seen = set()
+        idle_rounds = 0
         ROUND = 0
         SCROLL_PAUSE_TIME = random.uniform(3, 7)
+        wait_timeout = self.scroll_wait
+        self.round_stats = []
+        start = time.perf_counter()
+        reusable = True
         try:
+            # Collect what is already visible in case the first scroll loads nothing.
+            self.hand_off(self.collect_new_tweets(seen)[0], tweets_list)
             last_height = self.driver.execute_script(
                 "return document.body.scrollHeight")
             while True:
-                self.driver.execute_script(
-                    "window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(SCROLL_PAUSE_TIME)
-                new_height = self.driver.execute_script(
-                    "return document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
-
-                tweets_list += self.scrap_tweets()
-                ROUND += 1
-                logging.info(
-                    f'Round {ROUND} complete. Please wait, scraping...')
+                with recorder.stage('scroll_round') as stage:
+                    round_start = time.perf_counter()
+                    if self.adaptive_scroll:
+                        loaded, waited = self.scroll_and_wait(wait_timeout)
+                        if not loaded:
+                            if wait_timeout >= self.max_scroll_wait:
+                                break
+                            wait_timeout = min(wait_timeout * 2, self.max_scroll_wait)
+                            logging.info(
+                                f"Loading stalled, waiting up to {wait_timeout}s next round.")
+                            continue
+                        wait_timeout = self.scroll_wait
+                    else:
+                        self.driver.execute_script(
+                            "window.scrollTo(0, document.body.scrollHeight);")
+                        time.sleep(SCROLL_PAUSE_TIME)
+                        waited = SCROLL_PAUSE_TIME
+                        new_height = self.driver.execute_script(
+                            "return document.body.scrollHeight")
+                        if new_height == last_height:
+                            break
+                        last_height = new_height
+                    if self.jitter:
+                        time.sleep(random.uniform(0, self.jitter))
+
+                    new_tweets, reseen = self.collect_new_tweets(seen)
+                    self.hand_off(new_tweets, tweets_list)
+                    stage.rows = len(new_tweets)
+                    ROUND += 1
+                    elapsed = time.perf_counter() - round_start
+                    rate = len(new_tweets) / elapsed if elapsed else 0.0
+                    self.round_stats.append({
+                        'round': ROUND,
+                        'wait_seconds': waited,
+                        'new_tweets': len(new_tweets),
+                        'tweets_per_second': rate,
+                    })
+                    logging.info(
+                        f'Round {ROUND} complete: {len(new_tweets)} new, {reseen} re-seen, '
+                        f'waited {waited:.2f}s ({rate:.1f} tweets/s). '
+                        f'Please wait, scraping...')
+
+                    idle_rounds = 0 if new_tweets else idle_rounds + 1
+                    if idle_rounds >= self.max_idle_rounds:
+                        logging.info(
+                            f"No new tweets for {idle_rounds} rounds, stopping early.")
+                        break
 
             self.df = pd.DataFrame(tweets_list)
             logging.info('Scraping Completed')
         except Exception as e:
             logging.error(f"Error occurred: {e}")
+            reusable = False
             if tweets_list is not None:
                 self.df = pd.DataFrame(tweets_list)
                 logging.error(f"Saved data till now.")
         finally:
-            if self.driver is not None:
-                self.driver.quit()
+            self.timings['scrape'] = time.perf_counter() - start
+            logging.info(f"Scraper timings: {self.timings}")
+            self.close_driver(reusable)
         return self.df if hasattr(self, 'df') else None
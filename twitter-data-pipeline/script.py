@@ -1,15 +1,57 @@
 import boto3
 import logging
+import threading
+import numpy as np
 import pandas as pd
-from io import StringIO
-from datetime import datetime, timedelta
-from botocore.exceptions import NoCredentialsError
+from io import BytesIO, StringIO
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from botocore.config import Config
+from botocore.exceptions import ClientError, NoCredentialsError
+from metrics import recorder
 
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
 
+class ClientRegistry:
+    """
+    Process-wide registry of boto3 clients. A client is created lazily the
+    first time a given configuration is requested and reused afterwards;
+    boto3 clients are thread safe.
+    """
+
+    def __init__(self):
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, service_name, max_pool_connections=10, **kwargs):
+        """Returns the shared client for a service and configuration."""
+        key = (service_name, max_pool_connections, tuple(sorted(kwargs.items())))
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = boto3.client(
+                    service_name,
+                    config=Config(max_pool_connections=max_pool_connections),
+                    **kwargs)
+                self.clients[key] = client
+                self.created += 1
+            else:
+                self.reused += 1
+        return client
+
+    def stats(self):
+        """Returns how many clients were created and how often they were reused."""
+        return {'created': self.created, 'reused': self.reused}
+
+
+clients = ClientRegistry()
+
+
 class GetDate:
     def get_date(self):
         """Returns today's and yesterday's date."""
@@ -25,7 +67,7 @@ class GetDate:
 
 
 class FileHandling:
-    def create_filename_by_query(self, query):
+    def create_filename_by_query(self, query, file_format='csv'):
         """
         Generates a filename based on query.
         Expected format: "keyword date_until:YYYY-MM-DD date_since:YYYY-MM-DD ..."
@@ -34,7 +76,7 @@ class FileHandling:
             split_list = query.split(" ")
             if len(split_list) < 4:
                 logging.error("Input string does not contain enough elements.")
-                return "default.csv"
+                return f"default.{file_format}"
 
             searched_keyword = split_list[0]
             date_since = split_list[3].split(":")[1]
@@ -43,24 +85,179 @@ class FileHandling:
             valid_filename = "".join(
                 i for i in filename if i not in "\/:*?<>|")
 
-            return f"{valid_filename}.csv"
+            return f"{valid_filename}.{file_format}"
         except IndexError:
             logging.error(
                 "Error: Index out of range. Check your input string format. Expected format: 'keyword date_until:YYYY-MM-DD date_since:YYYY-MM-DD ...'")
 
+    def create_partitioned_filename(self, query, file_format='csv'):
+        """
+        Generates a "keyword=.../date=.../filename" key based on query.
+        The date comes from the since: or since_time: token of the query.
+        """
+        filename = self.create_filename_by_query(query, file_format)
+        split_list = query.split(" ")
+        keyword = "".join(i for i in split_list[0] if i not in "\/:*?<>|=\"")
+        date = None
+        for token in split_list:
+            name, _, value = token.partition(":")
+            if name == 'since':
+                date = value
+            elif name == 'since_time':
+                date = datetime.fromtimestamp(
+                    int(value), timezone.utc).strftime("%Y-%m-%d")
+        if date is None:
+            logging.error("Query has no since date to partition by.")
+            return filename
+        return f"keyword={keyword}/date={date}/{filename}"
+
+
+class SeenKeys:
+    """
+    Sorted uint64 row hashes already kept by earlier chunks of a stream.
+    Takes 8 bytes per row, so it stays small next to a set of Python ints.
+    """
+
+    def __init__(self, keys=None):
+        # `keys` must already be sorted and unique.
+        self.keys = np.empty(0, dtype=np.uint64) if keys is None else keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def contains(self, keys):
+        """Returns a bool array marking the keys already seen."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.searchsorted(self.keys, keys)
+        positions[positions == len(self.keys)] = 0
+        return self.keys[positions] == keys
+
+    def add(self, keys):
+        self.keys = np.union1d(self.keys, np.asarray(keys, dtype=np.uint64))
+
 
 class DataProcessor:
-    def __init__(self, df):
+    DUPLICATE_SUBSET = ['user', 'username', 'text', 'created_at']
+    COUNT_COLUMNS = ['like_count', 'reply_count', 'retweet_count', 'views_count']
+    CATEGORY_COLUMNS = ['username']
+    # Raw CSVs are read with the subset columns as text, so every chunk and
+    # file hashes alike whatever dtype pandas would infer, eg:- a numeric
+    # user is int64 in one chunk and float64 in one with a missing user.
+    RAW_DTYPES = dict.fromkeys(DUPLICATE_SUBSET, str)
+    # Rows hashed or parsed at a time in lean mode, which bounds the
+    # temporary copies pandas makes of string columns.
+    BLOCK_ROWS = 16384
+    # Column types written to Parquet files.
+    SCHEMA = {
+        'like_count': 'Int32',
+        'reply_count': 'Int32',
+        'retweet_count': 'Int32',
+        'views_count': 'Int32',
+        'compound': 'float32',
+        'sentiment': pd.CategoricalDtype(['Negative', 'Neutral', 'Positive']),
+    }
+
+    def __init__(self, df, lean=False):
         if not isinstance(df, pd.DataFrame):
             raise ValueError("df should be a pandas DataFrame")
         self.df = df
+        # Dedupe on one uint64 key per row and keep columns compact.
+        self.lean = lean
 
-    def remove_duplicates(self):
-        """Removes duplicate entries."""
-        self.df.drop_duplicates(
-            subset=['user', 'username', 'text', 'created_at'], inplace=True)
+    def remove_duplicates(self, seen=None):
+        """
+        Removes duplicate entries.
+        When `seen` SeenKeys are given, rows whose hash is already in them
+        (from earlier chunks of the same file) are dropped too and the hashes
+        of the remaining rows are added.
+        """
+        if self.lean:
+            return self.remove_duplicates_by_key(seen)
+        with recorder.stage('remove_duplicates', rows=len(self.df)):
+            self.df.drop_duplicates(subset=self.DUPLICATE_SUBSET, inplace=True)
+            if seen is not None:
+                hashes = self.row_keys().to_numpy()
+                is_new = ~seen.contains(hashes)
+                if not is_new.all():
+                    self.df.drop(index=self.df.index[~is_new], inplace=True)
+                seen.add(hashes[is_new])
         return self
     
+    def remove_duplicates_by_key(self, seen=None):
+        """
+        Removes duplicate entries by hashing the subset columns into one
+        uint64 key per row, and drops them together with the rows already
+        in `seen` in a single take.
+        """
+        with recorder.stage('remove_duplicates', rows=len(self.df)):
+            # Parsed here rather than in compact(), so row_keys() hashes it as is.
+            self.parse_created_at()
+            hashes = self.row_keys()
+            keep = ~hashes.duplicated().to_numpy()
+            if seen is not None:
+                keep &= ~seen.contains(hashes.to_numpy())
+                seen.add(hashes.to_numpy()[keep])
+            if not keep.all():
+                # In place, so the caller's frame does not stay alive next to a copy.
+                self.df.drop(index=self.df.index[~keep], inplace=True)
+        return self
+
+    def row_keys(self):
+        """
+        Returns one uint64 hash of the subset columns per row, hashed in
+        blocks of BLOCK_ROWS. created_at is parsed to UTC first, so raw
+        strings and typed columns hash alike. TweetIndex keys tweets with
+        the same hash.
+        """
+        subset = self.df[self.DUPLICATE_SUBSET]
+        blocks = [pd.util.hash_pandas_object(
+                      self.key_block(subset.iloc[start:start + self.BLOCK_ROWS]),
+                      index=False).to_numpy()
+                  for start in range(0, len(subset), self.BLOCK_ROWS)]
+        keys = np.concatenate(blocks) if blocks else np.empty(0, dtype=np.uint64)
+        return pd.Series(keys, copy=False)
+
+    def key_block(self, block):
+        """Returns a block of the subset columns as it is hashed."""
+        return block.assign(created_at=pd.to_datetime(
+            block['created_at'], errors='coerce', utc=True))
+
+    def compact(self):
+        """
+        Parses created_at once into UTC datetime64, downcasts the counts to
+        the smallest unsigned type and makes repeated strings categorical.
+        """
+        self.parse_created_at()
+        for column_name in self.COUNT_COLUMNS:
+            if column_name not in self.df.columns:
+                continue
+            column = self.df[column_name]
+            if column.isna().any():
+                # Missing counts need a nullable integer type.
+                self.df[column_name] = column.astype('UInt32')
+            else:
+                self.df[column_name] = pd.to_numeric(column, downcast='unsigned')
+        for column_name in self.CATEGORY_COLUMNS:
+            if column_name in self.df.columns:
+                self.df[column_name] = self.df[column_name].astype('category')
+        return self
+
+    def parse_created_at(self):
+        """Parses created_at into UTC datetime64 in blocks, unless it already is."""
+        if 'created_at' not in self.df.columns:
+            return self
+        column = self.df['created_at']
+        if isinstance(column.dtype, pd.DatetimeTZDtype):
+            return self
+        self.df['created_at'] = pd.concat(
+            [pd.to_datetime(column.iloc[start:start + self.BLOCK_ROWS],
+                            errors='coerce', utc=True)
+             for start in range(0, len(column), self.BLOCK_ROWS)]
+            or [pd.to_datetime(column, errors='coerce', utc=True)])
+        return self
+
     def delete_column(self, column_name):
         """Deletes a specified column."""
         if column_name in self.df.columns:
@@ -69,6 +266,16 @@ class DataProcessor:
             raise ValueError(f"The column {column_name} does not exist in the DataFrame.")
         return self
 
+    def apply_schema(self):
+        """Casts the known columns to their typed schema."""
+        if 'created_at' in self.df.columns:
+            self.df['created_at'] = pd.to_datetime(
+                self.df['created_at'], errors='coerce', utc=True)
+        for column_name, dtype in self.SCHEMA.items():
+            if column_name in self.df.columns:
+                self.df[column_name] = self.df[column_name].astype(dtype)
+        return self
+
     def convert_utc_to_ist(self, column_name):
         """Converts a specified column from UTC to IST."""
         if column_name in self.df.columns:
@@ -82,51 +289,303 @@ class DataProcessor:
         return self
 
 
+class S3MultipartWriter:
+    """
+    Streams bytes into an S3 object with a multipart upload. With
+    max_concurrency above 1, up to that many parts upload on threads while
+    the caller produces the next ones, so at most max_concurrency parts are
+    held in memory. Every part but the last must be at least 5 MiB.
+    """
+    PART_SIZE = 8 * 1024 * 1024
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, s3, bucket_name, file_name, part_size=None, max_concurrency=1):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.file_name = file_name
+        self.part_size = part_size or self.PART_SIZE
+        self.check_part_size(self.part_size)
+        self.buffer = bytearray()
+        self.parts = []
+        self.part_count = 0
+        self.bytes_written = 0
+        self.executor = None
+        self.pending = set()
+        if max_concurrency > 1:
+            self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.upload_id = s3.create_multipart_upload(
+            Bucket=bucket_name, Key=file_name)['UploadId']
+
+    @classmethod
+    def check_part_size(cls, part_size):
+        """Raises for parts S3 would reject; only the last part may be smaller."""
+        if part_size < cls.MIN_PART_SIZE:
+            raise ValueError(
+                f"part_size must be at least {cls.MIN_PART_SIZE} bytes (5 MiB), got {part_size}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+            return
+        try:
+            self.close()
+        except Exception:
+            self.abort()
+            raise
+
+    def write(self, data):
+        """Buffers data and uploads every full part."""
+        self.buffer += data
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            self.upload_part(self.part_size)
+
+    def write_df(self, df, header=True):
+        """Appends a DataFrame as CSV rows."""
+        self.write(df.to_csv(index=False, header=header).encode())
+
+    def upload_part(self, size):
+        body = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.part_count += 1
+        if self.executor is None:
+            self.parts.append(self.send_part(self.part_count, body))
+            return
+        # Wait for a free slot so memory stays bounded by max_concurrency parts.
+        while len(self.pending) >= self.max_concurrency:
+            self.collect(FIRST_COMPLETED)
+        self.pending.add(self.executor.submit(self.send_part, self.part_count, body))
+
+    def send_part(self, part_number, body):
+        response = self.s3.upload_part(Bucket=self.bucket_name,
+                                       Key=self.file_name,
+                                       PartNumber=part_number,
+                                       UploadId=self.upload_id,
+                                       Body=body)
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+
+    def collect(self, return_when):
+        """Records finished parts, raising the error of a failed one."""
+        done, self.pending = wait(self.pending, return_when=return_when)
+        for future in done:
+            self.parts.append(future.result())
+
+    def close(self):
+        """Uploads the remaining bytes and completes the upload."""
+        if self.buffer or not self.part_count:
+            self.upload_part(len(self.buffer))
+        if self.executor is not None:
+            self.collect(ALL_COMPLETED)
+            self.executor.shutdown()
+        self.parts.sort(key=lambda part: part['PartNumber'])
+        self.s3.complete_multipart_upload(Bucket=self.bucket_name,
+                                          Key=self.file_name,
+                                          UploadId=self.upload_id,
+                                          MultipartUpload={'Parts': self.parts})
+        logging.info(
+            f"Successfully streamed {self.bytes_written} bytes to "
+            f"{self.file_name} in {self.bucket_name} ({len(self.parts)} parts).")
+
+    def abort(self):
+        """Aborts the upload so no partial object is left behind."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        self.s3.abort_multipart_upload(Bucket=self.bucket_name,
+                                       Key=self.file_name,
+                                       UploadId=self.upload_id)
+        logging.error(f"Aborted the upload of {self.file_name}.")
+
+
 class AwsControl:
-    def __init__(self, aws_key, aws_secret, region_name='ap-south-1'):
+    FORMATS = ('csv', 'parquet')
+
+    # Rows serialized per CSV block; blocks are uploaded while the next is built.
+    CSV_BLOCK_ROWS = 50000
+
+    def __init__(self, aws_key, aws_secret, region_name='ap-south-1',
+                 endpoint_url=None, compression='zstd', max_pool_connections=10,
+                 part_size=S3MultipartWriter.PART_SIZE, max_concurrency=4,
+                 multipart_threshold=16 * 1024 * 1024, download_concurrency=1):
         self.aws_key = aws_key
         self.aws_secret = aws_secret
         self.region_name = region_name
+        # Points the client at an S3 stand-in such as moto when set.
+        self.endpoint_url = endpoint_url
+        # Parquet compression codec, eg:- "zstd" or "snappy".
+        self.compression = compression
+        # Size of the HTTP connection pool of the shared S3 client.
+        self.max_pool_connections = max_pool_connections
+        # Bytes per multipart part and ranged GET, eg:- 16 * 1024 * 1024
+        S3MultipartWriter.check_part_size(part_size)
+        self.part_size = part_size
+        # Parts uploaded at once per object; 1 keeps single requests.
+        self.max_concurrency = max_concurrency
+        # Ranged GETs at once per download, eg:- 4; 1 keeps a single GET.
+        self.download_concurrency = download_concurrency
+        # Uploads smaller than this use a single put_object.
+        self.multipart_threshold = multipart_threshold
+
+    @classmethod
+    def get_format(cls, file_name):
+        """Returns the file format implied by the file extension."""
+        extension = file_name.rsplit('.', 1)[-1].lower()
+        return extension if extension in cls.FORMATS else 'csv'
+
+    def serialize(self, df, file_name):
+        """Serializes a DataFrame in the format of the file name."""
+        if self.get_format(file_name) == 'parquet':
+            buffer = BytesIO()
+            df.to_parquet(buffer, index=False, compression=self.compression,
+                          coerce_timestamps='us', allow_truncated_timestamps=True)
+            return buffer.getvalue()
+        return df.to_csv(index=False).encode()
+
+    def serialize_blocks(self, df, file_name):
+        """Yields a DataFrame serialized in blocks; Parquet is one block."""
+        if self.get_format(file_name) == 'parquet':
+            yield self.serialize(df, file_name)
+            return
+        for start in range(0, max(len(df), 1), self.CSV_BLOCK_ROWS):
+            yield df.iloc[start:start + self.CSV_BLOCK_ROWS].to_csv(
+                index=False, header=start == 0).encode()
+
+    def deserialize(self, body, file_name, dtype=None):
+        """
+        Parses file contents in the format of the file name. `dtype` applies
+        to CSV files; Parquet files carry their own types.
+        """
+        if self.get_format(file_name) == 'parquet':
+            return pd.read_parquet(BytesIO(body))
+        return pd.read_csv(StringIO(body.decode('utf-8')), dtype=dtype)
+
+    @staticmethod
+    def split_s3_path(path):
+        """Returns the bucket and key of an "s3://bucket/key" path."""
+        bucket_name, _, key = path[len('s3://'):].partition('/')
+        return bucket_name, key
+
+    def get_client(self):
+        """Returns the shared S3 client for these credentials."""
+        return clients.get('s3',
+                           max_pool_connections=self.max_pool_connections,
+                           region_name=self.region_name,
+                           endpoint_url=self.endpoint_url,
+                           aws_access_key_id=self.aws_key,
+                           aws_secret_access_key=self.aws_secret)
 
     def upload_to_s3(self, df, file_name, bucket_name):
-        """Uploads a file to AWS S3."""
+        """Uploads a file to AWS S3. Returns whether the upload succeeded."""
         if file_name is None or df is None:
             logging.error("No file or data to upload.")
-            return
+            return False
 
         try:
-            s3 = boto3.client('s3',
-                              region_name=self.region_name,
-                              aws_access_key_id=self.aws_key,
-                              aws_secret_access_key=self.aws_secret)
-
-            csv_buffer = df.to_csv(index=False).encode()
-            s3.put_object(Bucket=bucket_name,
-                          Key=file_name,
-                          Body=csv_buffer)
+            s3 = self.get_client()
+
+            with recorder.stage('upload_to_s3', rows=len(df)) as stage:
+                stage.bytes = self.write_object(
+                    s3, bucket_name, file_name, self.serialize_blocks(df, file_name))
             logging.info(
                 f"Successfully uploaded {file_name} to {bucket_name}")
+            return True
         except FileNotFoundError:
             logging.error(f"The file {file_name} was not found")
         except NoCredentialsError:
             logging.error("Credentials not available.")
         except Exception as e:
             logging.error(f"An unknown error occurred: {e}")
+        return False
 
-    def download_from_s3(self, bucket_name, file_name):
+    def download_from_s3(self, bucket_name, file_name, dtype=None):
         """Downloads a file from AWS S3."""
         try:
-            s3 = boto3.client('s3',
-                              region_name=self.region_name,
-                              aws_access_key_id=self.aws_key,
-                              aws_secret_access_key=self.aws_secret)
+            s3 = self.get_client()
 
-            csv_obj = s3.get_object(Bucket=bucket_name, Key=file_name)
-            body = csv_obj['Body'].read().decode('utf-8')
-            df = pd.read_csv(StringIO(body))
+            with recorder.stage('download_from_s3') as stage:
+                body = self.read_object(s3, bucket_name, file_name)
+                df = self.deserialize(body, file_name, dtype)
+                stage.rows, stage.bytes = len(df), len(body)
             logging.info(
                 f"Successfully downloaded {file_name} from {bucket_name}.")
             return df
         except Exception as e:
             logging.error(f"An unknown error occurred.")
             raise e
+
+    def write_object(self, s3, bucket_name, file_name, blocks):
+        """
+        Uploads byte blocks with one put_object, or as a concurrent multipart
+        upload once they pass multipart_threshold. Returns the bytes written.
+        """
+        head = bytearray()
+        blocks = iter(blocks)
+        for block in blocks:
+            head += block
+            if self.max_concurrency > 1 and len(head) >= self.multipart_threshold:
+                break
+        else:
+            s3.put_object(Bucket=bucket_name, Key=file_name, Body=bytes(head))
+            return len(head)
+        # The next block is serialized while the writer uploads earlier parts.
+        with S3MultipartWriter(s3, bucket_name, file_name,
+                               self.part_size, self.max_concurrency) as writer:
+            writer.write(head)
+            for block in blocks:
+                writer.write(block)
+        return writer.bytes_written
+
+    def read_object(self, s3, bucket_name, file_name):
+        """
+        Reads an object with one GET. With download_concurrency above 1,
+        objects larger than part_size are fetched with that many ranged GETs
+        at a time into one buffer.
+        """
+        if self.download_concurrency <= 1:
+            return s3.get_object(Bucket=bucket_name, Key=file_name)['Body'].read()
+        try:
+            first = s3.get_object(Bucket=bucket_name, Key=file_name,
+                                  Range=f"bytes=0-{self.part_size - 1}")
+        except ClientError as e:
+            # Empty objects have no satisfiable range.
+            if e.response['Error']['Code'] != 'InvalidRange':
+                raise
+            return s3.get_object(Bucket=bucket_name, Key=file_name)['Body'].read()
+        head = first['Body'].read()
+        size = int(first['ContentRange'].rsplit('/', 1)[1])
+        if len(head) >= size:
+            return head
+        body = bytearray(size)
+        body[:len(head)] = head
+
+        def fetch(start):
+            end = min(start + self.part_size, size) - 1
+            # Pin the version read first so a concurrent overwrite cannot mix files.
+            part = s3.get_object(Bucket=bucket_name, Key=file_name, IfMatch=first['ETag'],
+                                 Range=f"bytes={start}-{end}")['Body'].read()
+            body[start:start + len(part)] = part
+
+        with ThreadPoolExecutor(max_workers=self.download_concurrency) as executor:
+            list(executor.map(fetch, range(len(head), size, self.part_size)))
+        return body
+
+    def stream_from_s3(self, bucket_name, file_name, chunksize, dtype=None):
+        """Yields a CSV file from AWS S3 as DataFrames of `chunksize` rows."""
+        try:
+            s3 = self.get_client()
+            csv_obj = s3.get_object(Bucket=bucket_name, Key=file_name)
+            for chunk in pd.read_csv(csv_obj['Body'], chunksize=chunksize, dtype=dtype):
+                yield chunk
+            logging.info(
+                f"Successfully streamed {file_name} from {bucket_name}.")
+        except Exception as e:
+            logging.error(f"An error occurred while streaming {file_name}.")
+            raise e
+
+    def open_s3_writer(self, bucket_name, file_name, part_size=None):
+        """Opens a multipart writer for a file in AWS S3."""
+        return S3MultipartWriter(self.get_client(), bucket_name, file_name,
+                                 part_size or self.part_size, self.max_concurrency)
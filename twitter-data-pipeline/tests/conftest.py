@@ -0,0 +1,61 @@
+import os
+import sys
+import boto3
+import pytest
+import pandas as pd
+from moto import mock_s3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import TwitterETL
+from script import AwsControl
+
+BUCKET = 'test-bucket'
+
+
+def make_tweets(rows, start='2024-01-01', user='user'):
+    created_at = pd.Timestamp(start, tz='UTC') + pd.to_timedelta(range(rows), unit='s')
+    return pd.DataFrame({
+        'user': [f"{user} {number}" for number in range(rows)],
+        'username': [f"@{user}{number}" for number in range(rows)],
+        'text': [f"tweet {number} about zomato" for number in range(rows)],
+        'created_at': created_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'like_count': range(rows),
+    })
+
+
+@pytest.fixture
+def tweets():
+    """Builds scraped tweets, one second apart from `start` (UTC)."""
+    return make_tweets
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """An AwsControl talking to moto's in-process S3, with BUCKET created."""
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        monkeypatch.setenv(name, 'testing')
+    with mock_s3():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        yield AwsControl('testing', 'testing', region_name='us-east-1')
+
+
+class FakeAnalyzer:
+    """Returns the frame unscored, so no VADER data is needed."""
+    cache = None
+
+    def __init__(self, df):
+        self.df = df
+
+    def analyze(self, **kwargs):
+        return self.df
+
+
+@pytest.fixture
+def make_etl(monkeypatch):
+    """Builds a TwitterETL that skips sentiment scoring."""
+    def make(**kwargs):
+        etl = TwitterETL(**kwargs)
+        monkeypatch.setattr(etl, 'create_analyzer', FakeAnalyzer)
+        return etl
+    return make
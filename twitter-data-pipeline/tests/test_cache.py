@@ -0,0 +1,76 @@
+import pandas as pd
+
+from cache import SentimentCache
+
+
+class Scorer:
+    """Scores a text by its length and records the texts it was asked for."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(texts.tolist())
+        lengths = texts.str.len().astype(float)
+        return pd.DataFrame({'neg': 0.0, 'neu': 1.0, 'pos': 0.0, 'compound': lengths / 100},
+                            index=texts.index)
+
+
+def fetch(cache, scorer, *texts):
+    return cache.fetch(pd.Series(texts, dtype=object), scorer)
+
+
+def test_scores_are_cached_by_normalized_text(tmp_path):
+    cache = SentimentCache(str(tmp_path / 'cache.sqlite'), 'v1')
+    scorer = Scorer()
+    first = fetch(cache, scorer, 'good food', 'bad')
+    second = fetch(cache, scorer, 'good   food', 'bad')
+    assert scorer.calls == [['good food', 'bad']]
+    assert second['compound'].tolist() == first['compound'].tolist()
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SentimentCache(str(tmp_path / 'cache.sqlite'), 'v1', max_entries=2)
+    scorer = Scorer()
+    fetch(cache, scorer, 'a', 'b')
+    fetch(cache, scorer, 'a')
+    # 'b' is now the least recently used and makes room for 'c'.
+    fetch(cache, scorer, 'c')
+    assert cache.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 2
+    scorer.calls = []
+    fetch(cache, scorer, 'a', 'c')
+    assert scorer.calls == []
+    fetch(cache, scorer, 'b')
+    assert scorer.calls == [['b']]
+
+
+def test_recency_survives_a_reopen(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = SentimentCache(path, 'v1', max_entries=2)
+    scorer = Scorer()
+    fetch(cache, scorer, 'a', 'b')
+    fetch(cache, scorer, 'a')
+    cache.close()
+    cache = SentimentCache(path, 'v1', max_entries=2)
+    fetch(cache, scorer, 'c')
+    scorer.calls = []
+    fetch(cache, scorer, 'a', 'b')
+    assert scorer.calls == [['b']]
+
+
+def test_a_new_version_drops_the_cache(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    scorer = Scorer()
+    cache = SentimentCache(path, 'v1')
+    fetch(cache, scorer, 'good food')
+    cache.close()
+
+    cache = SentimentCache(path, 'v1')
+    fetch(cache, scorer, 'good food')
+    assert len(scorer.calls) == 1
+    cache.close()
+
+    cache = SentimentCache(path, 'v2')
+    fetch(cache, scorer, 'good food')
+    assert len(scorer.calls) == 2
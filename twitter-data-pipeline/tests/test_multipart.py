@@ -0,0 +1,97 @@
+import time
+import pytest
+from contextlib import contextmanager
+
+from script import AwsControl, S3MultipartWriter
+
+# The smallest part S3 accepts; moto enforces it too.
+PART_SIZE = 5 * 1024 * 1024
+
+
+class SlowClient:
+    """
+    Wraps an S3 client so the first parts finish last, and so a chosen part
+    fails.
+    """
+
+    def __init__(self, s3, failing_part=None):
+        self.s3 = s3
+        self.failing_part = failing_part
+
+    def __getattr__(self, name):
+        return getattr(self.s3, name)
+
+    def upload_part(self, **kwargs):
+        if kwargs['PartNumber'] == self.failing_part:
+            raise RuntimeError(f"part {self.failing_part} failed")
+        time.sleep(0.2 / kwargs['PartNumber'])
+        return self.s3.upload_part(**kwargs)
+
+
+def parts(count):
+    return [bytes([number]) * PART_SIZE for number in range(count)]
+
+
+def test_concurrent_parts_are_completed_in_order(aws):
+    s3 = aws.get_client()
+    body = parts(4)
+    with S3MultipartWriter(SlowClient(s3), 'test-bucket', 'out.csv',
+                           part_size=PART_SIZE, max_concurrency=3) as writer:
+        for part in body:
+            writer.write(part)
+        writer.write(b'tail')
+    assert [part['PartNumber'] for part in writer.parts] == [1, 2, 3, 4, 5]
+    stored = s3.get_object(Bucket='test-bucket', Key='out.csv')['Body'].read()
+    assert stored == b''.join(body) + b'tail'
+
+
+@pytest.mark.parametrize('max_concurrency', [1, 3])
+def test_a_failed_part_aborts_the_upload(aws, max_concurrency):
+    s3 = aws.get_client()
+    with pytest.raises(RuntimeError, match='part 2 failed'):
+        with S3MultipartWriter(SlowClient(s3, failing_part=2), 'test-bucket', 'out.csv',
+                               part_size=PART_SIZE, max_concurrency=max_concurrency) as writer:
+            for part in parts(4):
+                writer.write(part)
+    assert s3.list_multipart_uploads(Bucket='test-bucket').get('Uploads', []) == []
+    assert s3.list_objects_v2(Bucket='test-bucket').get('KeyCount') == 0
+
+
+def test_parts_below_5_mib_are_rejected(aws):
+    with pytest.raises(ValueError):
+        AwsControl('testing', 'testing', part_size=PART_SIZE - 1)
+    with pytest.raises(ValueError):
+        S3MultipartWriter(aws.get_client(), 'test-bucket', 'out.csv', part_size=1024)
+
+
+@contextmanager
+def count_gets(s3):
+    """Records the Range of every GET; clients are shared, so it unregisters."""
+    gets = []
+    handler = lambda params, **kwargs: gets.append(params.get('Range'))
+    s3.meta.events.register('before-parameter-build.s3.GetObject', handler)
+    try:
+        yield gets
+    finally:
+        s3.meta.events.unregister('before-parameter-build.s3.GetObject', handler)
+
+
+def test_downloads_use_one_get_by_default(aws, tweets):
+    df = tweets(200000)
+    aws.upload_to_s3(df, 'big.csv', 'test-bucket')
+    with count_gets(aws.get_client()) as gets:
+        assert len(aws.download_from_s3('test-bucket', 'big.csv')) == len(df)
+    assert gets == [None]
+
+
+def test_ranged_downloads_when_opted_in(aws, tweets):
+    df = tweets(200000)
+    aws.upload_to_s3(df, 'big.csv', 'test-bucket')
+    ranged = AwsControl('testing', 'testing', region_name='us-east-1',
+                        part_size=PART_SIZE, download_concurrency=3)
+    s3 = ranged.get_client()
+    size = s3.head_object(Bucket='test-bucket', Key='big.csv')['ContentLength']
+    with count_gets(s3) as gets:
+        downloaded = ranged.download_from_s3('test-bucket', 'big.csv')
+    assert len(gets) == -(-size // PART_SIZE) > 1
+    assert downloaded.equals(aws.download_from_s3('test-bucket', 'big.csv'))
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from script import DataProcessor, SeenKeys
+
+
+def test_contains_and_add():
+    seen = SeenKeys()
+    assert seen.contains([1, 2]).tolist() == [False, False]
+    seen.add([5, 1, 5])
+    seen.add(np.array([3], dtype=np.uint64))
+    assert len(seen) == 3
+    assert seen.contains([1, 2, 3, 5, 6, 2 ** 64 - 1]).tolist() == [
+        True, False, True, True, False, False]
+
+
+@pytest.mark.parametrize('lean', [False, True])
+def test_duplicates_are_dropped_across_chunks(tweets, lean):
+    df = tweets(30)
+    # Every chunk repeats rows of the previous one and one of its own;
+    # like read_csv chunks, each has a unique index.
+    chunks = [pd.concat(parts, ignore_index=True) for parts in [
+        [df.iloc[0:10], df.iloc[[3]]],
+        [df.iloc[5:20], df.iloc[[0]]],
+        [df.iloc[15:30], df.iloc[[29]]]]]
+    seen = SeenKeys()
+    kept = [DataProcessor(chunk.copy(), lean=lean).remove_duplicates(seen).df
+            for chunk in chunks]
+    assert [len(chunk) for chunk in kept] == [10, 10, 10]
+    assert pd.concat(kept)['username'].tolist() == df['username'].tolist()
+    assert len(seen) == 30
+
+
+@pytest.mark.parametrize('lean', [False, True])
+def test_rows_that_differ_in_one_subset_column_are_kept(tweets, lean):
+    df = tweets(2)
+    df.loc[1, ['user', 'username', 'created_at']] = df.loc[0, ['user', 'username', 'created_at']]
+    seen = SeenKeys()
+    DataProcessor(df.iloc[[0]].copy(), lean=lean).remove_duplicates(seen)
+    assert len(DataProcessor(df.iloc[[1]].copy(), lean=lean).remove_duplicates(seen).df) == 1
+
+
+@pytest.mark.parametrize('lean_processing', [False, True])
+def test_streamed_chunks_hash_alike_whatever_dtype_is_inferred(aws, tweets, make_etl,
+                                                              lean_processing):
+    df = tweets(6)
+    # Numeric users parse as int64, or as float64 in a chunk with a missing one.
+    df['user'] = ['123', '124', '125', '123', None, '126']
+    df.loc[3, ['username', 'text', 'created_at']] = df.loc[0, ['username', 'text', 'created_at']]
+    aws.get_client().put_object(Bucket='test-bucket', Key='zomato_1.csv',
+                                Body=df.to_csv(index=False).encode())
+    etl = make_etl(stream_chunk_size=3, lean_processing=lean_processing)
+    etl.aws = aws
+    etl.raw_data_bucket_name = etl.processed_data_bucket_name = 'test-bucket'
+    processed_file_name = etl.twitter_data_transformation('zomato_1.csv')
+    processed = aws.download_from_s3('test-bucket', processed_file_name)
+    assert len(processed) == 5
@@ -0,0 +1,81 @@
+import os
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+
+from tweet_index import TweetIndex
+
+
+def segments(path, date='2024-01-01'):
+    directory = os.path.join(path, f"date={date}")
+    return sorted(name for name in os.listdir(directory) if name.endswith('.npy'))
+
+
+def test_commit_appends_a_segment_per_date(tmp_path, tweets):
+    index = TweetIndex(str(tmp_path))
+    index.filter_new(tweets(10))
+    index.commit()
+    assert len(segments(tmp_path)) == 1
+
+    # A second run drops what the first committed and adds only the rest.
+    index = TweetIndex(str(tmp_path))
+    df = index.filter_new(tweets(15))
+    assert df['username'].tolist() == [f"@user{number}" for number in range(10, 15)]
+    index.commit()
+    assert len(segments(tmp_path)) == 2
+    assert TweetIndex(str(tmp_path)).filter_new(tweets(15)).empty
+
+
+def test_raw_strings_and_parsed_dates_share_keys(tmp_path, tweets):
+    index = TweetIndex(str(tmp_path))
+    index.filter_new(tweets(5))
+    index.commit()
+    typed = tweets(5)
+    typed['created_at'] = pd.to_datetime(typed['created_at'], utc=True)
+    assert TweetIndex(str(tmp_path)).filter_new(typed).empty
+
+
+def test_segments_are_compacted_above_the_limit(tmp_path, tweets):
+    for run in range(TweetIndex.COMPACT_SEGMENTS + 1):
+        index = TweetIndex(str(tmp_path))
+        index.filter_new(tweets(3, user=f"run{run}"))
+        index.commit()
+    assert len(segments(tmp_path)) == 1
+    for run in range(TweetIndex.COMPACT_SEGMENTS + 1):
+        assert TweetIndex(str(tmp_path)).filter_new(tweets(3, user=f"run{run}")).empty
+
+
+def test_retention_prunes_old_dates(tmp_path, tweets):
+    today = datetime.now(timezone.utc)
+    old = (today - timedelta(days=40)).strftime('%Y-%m-%d')
+    recent = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+    index = TweetIndex(str(tmp_path), retention_days=30)
+    index.filter_new(pd.concat([tweets(3, start=old), tweets(3, start=recent)],
+                               ignore_index=True))
+    index.commit()
+    assert sorted(os.listdir(tmp_path)) == [f"date={recent}"]
+
+
+def test_s3_index(aws, tweets):
+    path = 's3://test-bucket/tweet_index'
+    index = TweetIndex(path, aws)
+    index.filter_new(tweets(10))
+    index.commit()
+    assert len(index.list_segments('2024-01-01')) == 1
+    df = TweetIndex(path, aws).filter_new(tweets(12))
+    assert df['username'].tolist() == ['@user10', '@user11']
+
+
+@pytest.mark.parametrize('lean_processing', [False, True])
+def test_index_commits_only_after_the_upload(tmp_path, tweets, monkeypatch, make_etl,
+                                            lean_processing):
+    etl = make_etl(tweet_index_path=str(tmp_path), lean_processing=lean_processing)
+    monkeypatch.setattr(etl, 'download_data', lambda: tweets(10))
+    monkeypatch.setattr(etl, 'upload_processed_data', lambda df: None)
+    with pytest.raises(RuntimeError):
+        etl.twitter_data_transformation('zomato_1.csv')
+    assert not os.listdir(tmp_path)
+
+    monkeypatch.setattr(etl, 'upload_processed_data', lambda df: 'analyzed_zomato_1.csv')
+    assert etl.twitter_data_transformation('zomato_1.csv') == 'analyzed_zomato_1.csv'
+    assert len(segments(tmp_path)) == 1
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from watermark import Watermark, WatermarkStore, tweet_ids
+
+
+def at(*times, user='user'):
+    """Tweets posted at the given UTC times, as raw scraped strings."""
+    return pd.DataFrame({
+        'username': [f"@{user}{number}" for number in range(len(times))],
+        'text': [f"tweet {number}" for number in range(len(times))],
+        'created_at': [f"2024-01-01T{time}.000Z" for time in times],
+    })
+
+
+def test_an_empty_watermark_keeps_everything():
+    df = at('10:00:00', '11:00:00')
+    assert Watermark().filter_new(df) is df
+
+
+def test_advance_records_the_newest_instant_and_its_tweets():
+    df = at('10:00:00', '11:00:00', '11:00:00')
+    watermark = Watermark().advance(df)
+    assert watermark.created_at == pd.Timestamp('2024-01-01 11:00:00', tz='UTC')
+    assert watermark.boundary_ids == set(tweet_ids(df.iloc[1:]))
+
+
+def test_filter_new_keeps_unseen_tweets_at_the_boundary():
+    loaded = at('10:00:00', '11:00:00')
+    watermark = Watermark().advance(loaded)
+    # The boundary tweet comes back, next to a new tweet of the same second.
+    scraped = pd.concat([loaded, at('11:00:00', '12:00:00', user='other')],
+                        ignore_index=True)
+    kept = watermark.filter_new(scraped)
+    assert kept['username'].tolist() == ['@other0', '@other1']
+
+
+def test_filter_new_keeps_tweets_without_a_timestamp():
+    watermark = Watermark().advance(at('11:00:00'))
+    scraped = at('09:00:00', '12:00:00')
+    scraped.loc[0, 'created_at'] = None
+    assert watermark.filter_new(scraped)['username'].tolist() == ['@user0', '@user1']
+
+
+def test_merge_never_moves_backwards_and_unions_the_boundary():
+    early = Watermark('2024-01-01T10:00:00Z', {'a'})
+    late = Watermark('2024-01-01T11:00:00Z', {'b'})
+    assert early.merge(late) is late
+    assert late.merge(early) is late
+    assert late.merge(Watermark()) is late
+    assert Watermark().merge(early) is early
+    merged = late.merge(Watermark('2024-01-01T11:00:00Z', {'c'}))
+    assert merged.created_at == late.created_at
+    assert merged.boundary_ids == {'b', 'c'}
+
+
+def test_raw_strings_and_parsed_dates_share_ids():
+    df = at('10:00:00')
+    typed = df.assign(created_at=pd.to_datetime(df['created_at'], utc=True))
+    assert tweet_ids(df).tolist() == tweet_ids(typed).tolist()
+
+
+def test_local_store_round_trip(tmp_path):
+    store = WatermarkStore(str(tmp_path / 'watermark.json'))
+    assert store.load().created_at is None
+    late = Watermark().advance(at('11:00:00'))
+    with store.lock():
+        store.save(late)
+        # Saving an older mark keeps the stored one.
+        store.save(Watermark().advance(at('10:00:00')))
+    loaded = store.load()
+    assert loaded.created_at == late.created_at
+    assert loaded.boundary_ids == late.boundary_ids
+
+
+def test_s3_store_round_trip(aws):
+    store = WatermarkStore('s3://test-bucket/state/watermark.json', aws)
+    assert store.load().created_at is None
+    watermark = Watermark().advance(at('11:00:00'))
+    store.save(watermark)
+    assert store.load().to_dict() == watermark.to_dict()
@@ -0,0 +1,205 @@
+import os
+import io
+import uuid
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+from script import DataProcessor, SeenKeys
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+
+def tweet_keys(df):
+    """
+    Returns the dedupe key of every tweet, the same DataProcessor.row_keys
+    hash the pipeline drops duplicates with, and its UTC posting date.
+    """
+    keys = DataProcessor(df).row_keys().to_numpy()
+    created_at = pd.to_datetime(df['created_at'], errors='coerce', utc=True)
+    dates = created_at.dt.strftime('%Y-%m-%d').fillna('unknown').to_numpy()
+    return keys, dates
+
+
+class TweetIndex:
+    """
+    Persistent set of the tweets already written to the processed bucket,
+    in a local directory or under an "s3://bucket/prefix" path. Every date
+    holds immutable segments of sorted uint64 keys; a commit only adds a new
+    segment, so concurrent runs never overwrite each other's keys. Once a
+    date has many segments they are merged into one, and only the merged
+    segments are deleted. Only the dates present in a batch are read.
+    """
+    # Segments of a date above which a commit merges them.
+    COMPACT_SEGMENTS = 8
+    # Listings retried when a segment is merged away while being read.
+    READ_ATTEMPTS = 3
+
+    def __init__(self, path, aws=None, retention_days=None):
+        self.path = path.rstrip('/')
+        self.aws = aws
+        # Partitions of tweets older than this many days are deleted, eg:- 30
+        self.retention_days = retention_days
+        self.partitions = {}
+        self.pending = {}
+
+    def is_s3(self):
+        return self.path.startswith('s3://')
+
+    def location(self, date):
+        return f"{self.path}/date={date}"
+
+    def list_segments(self, date):
+        """Returns the paths of the segments of a date."""
+        directory = self.location(date)
+        if self.is_s3():
+            bucket_name, prefix = self.aws.split_s3_path(f"{directory}/")
+            pages = self.aws.get_client().get_paginator('list_objects_v2').paginate(
+                Bucket=bucket_name, Prefix=prefix)
+            return [f"s3://{bucket_name}/{obj['Key']}" for page in pages
+                    for obj in page.get('Contents', []) if obj['Key'].endswith('.npy')]
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in os.listdir(directory)
+                if name.endswith('.npy')]
+
+    def read_segment(self, path):
+        """Returns the keys of a segment, or None once it has been merged away."""
+        try:
+            if self.is_s3():
+                bucket_name, key = self.aws.split_s3_path(path)
+                body = self.aws.get_client().get_object(
+                    Bucket=bucket_name, Key=key)['Body'].read()
+            else:
+                with open(path, 'rb') as index_file:
+                    body = index_file.read()
+        except FileNotFoundError:
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return np.load(io.BytesIO(body), allow_pickle=False)
+
+    def read(self, date):
+        """Returns the stored keys of a date and the segments they came from."""
+        for _ in range(self.READ_ATTEMPTS):
+            paths = self.list_segments(date)
+            segments = [self.read_segment(path) for path in paths]
+            if all(segment is not None for segment in segments):
+                break
+            # A concurrent commit merged some segments; list them again.
+        else:
+            segments = [segment for segment in segments if segment is not None]
+        keys = np.unique(np.concatenate(segments)) if segments else np.empty(0, dtype=np.uint64)
+        return keys, paths
+
+    def write_segment(self, date, keys):
+        """Stores keys as a new segment of a date."""
+        buffer = io.BytesIO()
+        np.save(buffer, keys, allow_pickle=False)
+        path = f"{self.location(date)}/{uuid.uuid4().hex}.npy"
+        if self.is_s3():
+            bucket_name, key = self.aws.split_s3_path(path)
+            self.aws.get_client().put_object(
+                Bucket=bucket_name, Key=key, Body=buffer.getvalue())
+        else:
+            os.makedirs(self.location(date), exist_ok=True)
+            # Readers only list .npy files, so they never see a partial one.
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'wb') as index_file:
+                index_file.write(buffer.getvalue())
+            os.replace(temp_path, path)
+        return path
+
+    def delete(self, paths):
+        if self.is_s3():
+            s3 = self.aws.get_client()
+            for start in range(0, len(paths), 1000):
+                locations = [self.aws.split_s3_path(path) for path in paths[start:start + 1000]]
+                s3.delete_objects(Bucket=locations[0][0], Delete={
+                    'Objects': [{'Key': key} for _, key in locations], 'Quiet': True})
+        else:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def get(self, date):
+        """Returns the SeenKeys of a date, read on first use."""
+        if date not in self.partitions:
+            self.partitions[date] = SeenKeys(self.read(date)[0])
+        return self.partitions[date]
+
+    def filter_new(self, df):
+        """
+        Drops, in place, the tweets of `df` that are already indexed and
+        stages the keys of the rest until commit().
+        """
+        if df is None or df.empty:
+            return df
+        keys, dates = tweet_keys(df)
+        is_new = np.ones(len(df), dtype=bool)
+        for date in np.unique(dates):
+            in_date = dates == date
+            is_new[in_date] = ~self.get(date).contains(keys[in_date])
+        if not is_new.all():
+            df.drop(index=df.index[~is_new], inplace=True)
+        for date in np.unique(dates[is_new]):
+            self.pending.setdefault(date, []).append(keys[is_new & (dates == date)])
+        logging.info(
+            f"Tweet index: {int((~is_new).sum())} of {len(is_new)} tweets were already loaded.")
+        return df
+
+    def commit(self):
+        """Stores the staged keys as one new segment per date."""
+        for date, blocks in self.pending.items():
+            keys = np.unique(np.concatenate(blocks))
+            self.write_segment(date, keys)
+            self.get(date).add(keys)
+            self.compact(date)
+        logging.info(
+            f"Tweet index: added {sum(len(block) for blocks in self.pending.values() for block in blocks)} "
+            f"keys across {len(self.pending)} dates.")
+        self.pending = {}
+        self.prune()
+
+    def compact(self, date):
+        """
+        Merges the segments of a date once there are too many. Only the
+        segments that were read are deleted, so keys committed meanwhile stay.
+        """
+        paths = self.list_segments(date)
+        if len(paths) <= self.COMPACT_SEGMENTS:
+            return
+        keys, paths = self.read(date)
+        self.write_segment(date, keys)
+        self.delete(paths)
+        logging.info(f"Tweet index: merged {len(paths)} segments of {date}.")
+
+    def prune(self):
+        """Deletes the partitions older than retention_days."""
+        if self.retention_days is None:
+            return
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        if self.is_s3():
+            bucket_name, prefix = self.aws.split_s3_path(f"{self.path}/date=")
+            pages = self.aws.get_client().get_paginator('list_objects_v2').paginate(
+                Bucket=bucket_name, Prefix=prefix)
+            stale = [f"s3://{bucket_name}/{obj['Key']}" for page in pages
+                     for obj in page.get('Contents', [])
+                     if obj['Key'][len(prefix):len(prefix) + 10] < cutoff]
+            if stale:
+                self.delete(stale)
+        else:
+            stale = [name for name in os.listdir(self.path)
+                     if name.startswith('date=') and name[len('date='):] < cutoff] \
+                if os.path.isdir(self.path) else []
+            for name in stale:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        if stale:
+            logging.info(f"Tweet index: pruned {len(stale)} segments or dates older than {cutoff}.")
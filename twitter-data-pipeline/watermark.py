@@ -0,0 +1,149 @@
+import os
+import json
+import fcntl
+import hashlib
+import logging
+import pandas as pd
+from contextlib import contextmanager
+from botocore.exceptions import ClientError
+
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+
+
+def tweet_ids(df):
+    """Returns a stable identity for every tweet of a scraped DataFrame."""
+    columns = [column for column in ['username', 'created_at', 'text']
+               if column in df.columns]
+    identity = df[columns].copy()
+    if 'created_at' in identity.columns:
+        # Parse the timestamp so raw strings and typed columns hash the same.
+        identity['created_at'] = pd.to_datetime(
+            identity['created_at'], errors='coerce', utc=True)
+    keys = identity.astype(str).agg('|'.join, axis=1)
+    return keys.map(
+        lambda key: hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest())
+
+
+class Watermark:
+    """
+    High-water mark of incremental extraction: the newest `created_at` seen
+    and the ids of the tweets posted at exactly that instant.
+    """
+
+    def __init__(self, created_at=None, boundary_ids=()):
+        self.created_at = None if created_at is None else pd.Timestamp(created_at)
+        self.boundary_ids = set(boundary_ids)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('created_at'), data.get('boundary_ids', []))
+
+    def to_dict(self):
+        return {
+            'created_at': None if self.created_at is None else self.created_at.isoformat(),
+            'boundary_ids': sorted(self.boundary_ids),
+        }
+
+    def filter_new(self, df):
+        """Keeps only the tweets newer than the watermark."""
+        if self.created_at is None or df is None or df.empty:
+            return df
+        created_at = pd.to_datetime(df['created_at'], errors='coerce', utc=True)
+        is_new = (created_at > self.created_at) | created_at.isna()
+        at_boundary = created_at == self.created_at
+        if at_boundary.any():
+            is_new |= at_boundary & ~tweet_ids(df).isin(self.boundary_ids)
+        logging.info(
+            f"{int(is_new.sum())} of {len(df)} scraped tweets are newer than the watermark.")
+        return df[is_new]
+
+    def advance(self, df):
+        """Returns the watermark after loading the tweets of `df`."""
+        created_at = pd.to_datetime(df['created_at'], errors='coerce', utc=True)
+        newest = created_at.max()
+        if pd.isna(newest):
+            return self
+        boundary_ids = set(tweet_ids(df[created_at == newest]))
+        return self.merge(Watermark(newest, boundary_ids))
+
+    def merge(self, other):
+        """Returns the later of two watermarks, so it never moves backwards."""
+        if self.created_at is None or (
+                other.created_at is not None and other.created_at > self.created_at):
+            return other
+        if other.created_at == self.created_at:
+            return Watermark(self.created_at, self.boundary_ids | other.boundary_ids)
+        return self
+
+
+class WatermarkStore:
+    """
+    Persists a Watermark as JSON in a local file or, for paths starting with
+    "s3://", in an S3 object. Local stores are locked for the whole
+    extraction, so concurrent runs on one host take turns. S3 stores are not
+    locked: two runs would scrape the same window and the later save could
+    overwrite a newer mark, so only one incremental run may use an S3 store
+    at a time (the DAG limits itself to one active run for this).
+    """
+
+    def __init__(self, path, aws=None):
+        self.path = path
+        self.aws = aws
+
+    def is_s3(self):
+        return self.path.startswith('s3://')
+
+    @contextmanager
+    def lock(self):
+        """
+        Holds an exclusive lock on a local store. S3 has no lock to take, so
+        S3 stores are left to a single writer.
+        """
+        if self.is_s3():
+            yield
+            return
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        """Returns the stored watermark, or an empty one on the first run."""
+        try:
+            if self.is_s3():
+                bucket_name, key = self.aws.split_s3_path(self.path)
+                body = self.aws.get_client().get_object(
+                    Bucket=bucket_name, Key=key)['Body'].read()
+            else:
+                with open(self.path, 'rb') as state_file:
+                    body = state_file.read()
+        except FileNotFoundError:
+            return Watermark()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return Watermark()
+            raise
+        return Watermark.from_dict(json.loads(body))
+
+    def save(self, watermark):
+        """
+        Merges `watermark` with the stored one and writes the result. The
+        merge keeps a run from moving its own mark backwards; it does not
+        protect an S3 store from a concurrent writer.
+        """
+        watermark = self.load().merge(watermark)
+        body = json.dumps(watermark.to_dict()).encode('utf-8')
+        if self.is_s3():
+            bucket_name, key = self.aws.split_s3_path(self.path)
+            self.aws.get_client().put_object(Bucket=bucket_name, Key=key, Body=body)
+        else:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'wb') as state_file:
+                state_file.write(body)
+            os.replace(temp_path, self.path)
+        logging.info(f"Watermark saved: {watermark.created_at}")
+        return watermark